@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmark for per-item expression evaluation
+
+Usage: python benchmarks/expressions.py [number]
+
+Compares the default Chameleon engine with the native engine for plain
+python expressions, and per-item calls with batch evaluation.
+"""
+from __future__ import print_function
+import sys
+import timeit
+
+from transmogrifier import Transmogrifier
+from transmogrifier.expression import Expression
+
+EXPRESSIONS = (
+    "python:item.get('portal_type') == 'Document'",
+    "python:item['id'] * 2",
+    "python:[item[k] for k in ('id', 'portal_type')]",
+)
+
+
+def get_transmogrifier(engine):
+    transmogrifier = Transmogrifier({})
+    transmogrifier._data = {'transmogrifier': {'expression_engine': engine}}
+    return transmogrifier
+
+
+def main(number=100000):
+    item = {'id': 1, 'portal_type': 'Document'}
+    for source in EXPRESSIONS:
+        print(source)
+        timings = {}
+        for engine in ('chameleon', 'native'):
+            expression = Expression(
+                source, get_transmogrifier(engine), 'benchmark', {})
+            timings[engine] = min(timeit.repeat(
+                lambda: expression(item, **item), number=number, repeat=3))
+            print('    {0:10s} {1:8.3f} us/item'.format(
+                engine, timings[engine] / number * 1e6))
+        print('    speedup    {0:8.2f}x'.format(
+            timings['chameleon'] / timings['native']))
+        items = [item] * 100
+        for engine in ('chameleon', 'native'):
+            expression = Expression(
+                source, get_transmogrifier(engine), 'benchmark', {})
+            timing = min(timeit.repeat(
+                lambda: expression.batch(items, items),
+                number=number // len(items), repeat=3))
+            print('    {0:10s} {1:8.3f} us/item (batch)'.format(
+                engine, timing / number * 1e6))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
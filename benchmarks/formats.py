@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Benchmark for loading items from the file format sections
+
+Usage: python benchmarks/formats.py [number]
+
+Writes the same items with the CSV, JSON Lines and spool constructors and
+compares the time to load them back with the matching sources.
+"""
+from __future__ import print_function
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+from transmogrifier import Transmogrifier
+from transmogrifier.blueprints.data import CSVConstructor
+from transmogrifier.blueprints.data import CSVSource
+from transmogrifier.blueprints.jsonl import JSONLinesConstructor
+from transmogrifier.blueprints.jsonl import JSONLinesSource
+from transmogrifier.blueprints.spool import SpoolConstructor
+from transmogrifier.blueprints.spool import SpoolSource
+
+FORMATS = (
+    ('csv', CSVConstructor, CSVSource, {}),
+    ('jsonl', JSONLinesConstructor, JSONLinesSource, {}),
+    ('spool', SpoolConstructor, SpoolSource, {}),
+    ('spool+zlib', SpoolConstructor, SpoolSource, {'compression': 'zlib'}),
+)
+
+
+def get_items(number):
+    for i in range(number):
+        yield {'id': str(i), 'title': 'Item {0:d}'.format(i),
+               'description': 'Description of the item {0:d}'.format(i),
+               'portal_type': 'Document'}
+
+
+def main(number=100000):
+    transmogrifier = Transmogrifier({})
+    tempdir = tempfile.mkdtemp()
+    timings = {}
+    try:
+        for name, constructor, source, options in FORMATS:
+            options = dict(options, filename=os.path.join(tempdir, name))
+            for item in constructor(transmogrifier, 'constructor', options,
+                                    get_items(number)):
+                pass
+
+            def load():
+                for item in source(transmogrifier, 'source', options,
+                                   iter(())):
+                    pass
+
+            timings[name] = min(timeit.repeat(load, number=1, repeat=3))
+            print('{0:12s} {1:8.3f} us/item {2:8.1f} MB'.format(
+                name, timings[name] / number * 1e6,
+                os.path.getsize(options['filename']) / 1e6))
+    finally:
+        shutil.rmtree(tempdir)
+    for name in ('spool', 'spool+zlib'):
+        print('{0:s} speedup over csv {1:.2f}x'.format(
+            name, timings['csv'] / timings[name]))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
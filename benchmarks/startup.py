@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Benchmark for the start up time of the transmogrify command
+
+Usage: python benchmarks/startup.py [repeat]
+
+Measures the wall time of fresh processes importing transmogrifier, listing
+the registered blueprints and running a small pipeline, with and without
+the snapshot of the configured registrations.
+"""
+from __future__ import print_function
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MAIN = 'from transmogrifier.main import __main__; __main__()'
+
+PIPELINE = """\
+[transmogrifier]
+pipeline =
+    source
+    set
+    filter
+
+[source]
+blueprint = transmogrifier.from
+expression = python:[{'id': str(i)} for i in range(10)]
+
+[set]
+blueprint = transmogrifier.set
+title = python:item['id'].upper()
+
+[filter]
+blueprint = transmogrifier.filter
+condition = python:True
+"""
+
+
+def measure(args, repeat):
+    timings = []
+    for i in range(repeat):
+        start = time.time()
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call([sys.executable] + args, stdout=devnull,
+                                  stderr=devnull)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def main(repeat=5):
+    tempdir = tempfile.mkdtemp()
+    try:
+        pipeline = os.path.join(tempdir, 'pipeline.cfg')
+        with open(pipeline, 'w') as fp:
+            fp.write(PIPELINE)
+        cache = '--registry-cache=' + os.path.join(tempdir, 'registry.json')
+
+        commands = (
+            ('python', ['-c', 'pass']),
+            ('import', ['-c', 'import transmogrifier']),
+            ('--list', ['-c', MAIN, '--list']),
+            ('--list cached', ['-c', MAIN, '--list', cache]),
+            ('pipeline', ['-c', MAIN, pipeline]),
+            ('pipeline cached', ['-c', MAIN, pipeline, cache]),
+        )
+        for name, args in commands:
+            print('{0:16s} {1:8.1f} ms'.format(
+                name, measure(args, repeat) * 1000))
+    finally:
+        shutil.rmtree(tempdir)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:2]))
@@ -27,6 +27,7 @@ setup(
         'configparser',
         'docopt',
         'future',
+        'scandir; python_version < "3.5"',
         'chameleon',
         'zope.interface',
         'zope.component',
@@ -1,16 +1,57 @@
 # -*- coding: utf-8 -*-
+import os
+
 from zope.component import adapter
+from zope.component import getUtility
 
 from zope.interface import implementer
 from zope.interface import Interface
 
-from future.moves.collections import UserDict
+try:
+    from collections import UserDict
+except ImportError:  # Python 2
+    from future.moves.collections import UserDict
 
+from transmogrifier.cache import configuration_cache
+from transmogrifier.checkpoint import Checkpoint
+from transmogrifier.instrumentation import Recorder
+from transmogrifier.interfaces import ISectionBlueprint
 from transmogrifier.interfaces import ITransmogrifier
 from transmogrifier.options import Options
-from transmogrifier.utils import load_config
+from transmogrifier.options import Substitutions
+from transmogrifier.utils import apply_overrides
+from transmogrifier.utils import copy_config
 from transmogrifier.utils import get_lines
 from transmogrifier.utils import constructPipeline
+from transmogrifier.utils import to_boolean
+
+
+class Plan(object):
+    """Pipeline configuration prepared for repeated execution
+
+    A plan holds the resolved configuration, its substitutions and the
+    blueprints of the pipeline sections. Calling the plan with a context
+    executes the pipeline for that context. Overrides given on a call are
+    applied to a copy of the configuration, and only the options depending
+    on the overridden options are substituted again for that run.
+
+    """
+    def __init__(self, configuration_id, config):
+        self.configuration_id = configuration_id
+        self.config = config
+        self.sections = get_lines(config['transmogrifier']['pipeline'])
+
+        self.substitutions = Substitutions(config)
+        self.blueprints = {}
+        for section in self.sections:
+            blueprint_id = self.substitutions.get_section(section)['blueprint']
+            if blueprint_id not in self.blueprints:
+                self.blueprints[blueprint_id] = getUtility(
+                    ISectionBlueprint, blueprint_id)
+
+    def __call__(self, context, **overrides):
+        transmogrifier = Transmogrifier(context)
+        transmogrifier.execute(self, **overrides)
 
 
 @implementer(ITransmogrifier)
@@ -20,22 +61,81 @@ class Transmogrifier(UserDict):
     # noinspection PyMissingConstructor
     def __init__(self, context):
         self.context = context
+        self.checkpoint = None
+        self.recorder = None
+        self.resume = False
+        self.substitutions = None
         self._data = {}
         self.data = {}
 
     def __call__(self, configuration_id, **overrides):
-        self.configuration_id = configuration_id
-        self._data = load_config(configuration_id, **overrides)
+        plan = self.prepare(configuration_id, **overrides)
+        try:
+            self.execute(plan)
+        finally:
+            configuration_cache.flush()
+
+    def prepare(self, configuration_id, **overrides):
+        config = configuration_cache.load(configuration_id, **overrides)
+        return Plan(configuration_id, config)
+
+    def execute(self, plan, **overrides):
+        self.configuration_id = plan.configuration_id
+        self._data = copy_config(plan.config)
         self.data = {}
+        if overrides:
+            apply_overrides(self._data, overrides)
+            self.substitutions = plan.substitutions.copy(self._data)
+            self.substitutions.invalidate([
+                (section, key) for section, options in overrides.items()
+                for key in options])
+            sections = get_lines(self._data['transmogrifier']['pipeline'])
+        else:
+            self.substitutions = plan.substitutions
+            sections = plan.sections
 
         options = self._data['transmogrifier']
-        sections = get_lines(options['pipeline'])
-        pipeline = constructPipeline(self, sections)
+        if to_boolean(options.get('instrument')):
+            self.recorder = Recorder()
+        else:
+            self.recorder = None
+
+        path = (options.get('checkpoint') or '').strip()
+        if path:
+            if not os.path.isabs(path):
+                path = os.path.join(os.getcwd(), path)
+            self.checkpoint = Checkpoint(
+                path, int(options.get('checkpoint_interval') or '1000'),
+                options.get('checkpoint_key'), self.resume)
+        else:
+            self.checkpoint = None
+
+        pipeline = constructPipeline(self, sections,
+                                     blueprints=plan.blueprints)
 
         # Pipeline execution
-        # noinspection PyUnusedLocal
-        for item in pipeline:
-            pass  # discard once processed
+        checkpoint = self.checkpoint
+        completed = False
+        try:
+            if checkpoint is None:
+                # noinspection PyUnusedLocal
+                for item in pipeline:
+                    pass  # discard once processed
+            else:
+                for item in pipeline:
+                    checkpoint.processed(item)
+            completed = True
+        finally:
+            if not completed:
+                # Let the sections roll back before the state is saved
+                close = getattr(pipeline, 'close', None)
+                if close is not None:
+                    close()
+            if checkpoint is not None:
+                checkpoint.close(completed)
+            if self.recorder is not None:
+                self.recorder.stop()
+                self.recorder.report()
 
     def __getitem__(self, section):
         try:
@@ -46,9 +146,12 @@ class Transmogrifier(UserDict):
         # May raise key error
         data = self._data[section]
 
+        if self.substitutions is None:
+            self.substitutions = Substitutions(self._data)
+
         options = Options(self, section, data)
-        self[section] = options  # must be set before substitution below
         options.substitute()
+        self[section] = options
 
         return self.data[section]
 
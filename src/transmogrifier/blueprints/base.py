@@ -4,7 +4,7 @@ from __future__ import unicode_literals
 from zope.interface import provider
 from zope.interface import implementer
 
-from transmogrifier.condition import Condition
+from transmogrifier.condition import get_condition
 
 from transmogrifier.interfaces import ISectionBlueprint
 from transmogrifier.interfaces import ISection
@@ -32,10 +32,8 @@ class ConditionalBlueprint(Blueprint):
         super(ConditionalBlueprint, self).__init__(
             transmogrifier, name, options, previous)
 
-        self.condition = Condition(
-            options.get('condition', 'python:True'),
-            transmogrifier, name, options
-        )
+        self.condition = get_condition(
+            options.get('condition'), transmogrifier, name, options)
 
     def __iter__(self):
         raise NotImplementedError('__iter__')
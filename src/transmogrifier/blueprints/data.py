@@ -1,20 +1,31 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from io import StringIO
-from io import BytesIO
+from collections import deque
 from csv import DictReader
-from csv import DictWriter
 from email.message import Message
 from operator import methodcaller
+import codecs
+import csv
+import io
 import os
 import sys
 import logging
+import multiprocessing
+
+from six import PY2
 
 from transmogrifier.blueprints import Blueprint
 from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.checkpoint import is_resuming
+from transmogrifier.compression import CompressingWriter
+from transmogrifier.compression import DecompressingReader
+from transmogrifier.compression import get_compression
+from transmogrifier.condition import ALWAYS
 from transmogrifier.utils import is_mapping
 from transmogrifier.utils import get_words
+from transmogrifier.utils import to_boolean
 
 
 logger = logging.getLogger('transmogrifier')
@@ -23,8 +34,10 @@ logger = logging.getLogger('transmogrifier')
 class DelTransform(ConditionalBlueprint):
     def __iter__(self):
         keys = get_words(self.options.get('keys'))
+        condition = self.condition
+        always = condition is ALWAYS
         for item in self.previous:
-            if self.condition(item):
+            if always or condition(item):
                 for key in keys:
                     if key in item:
                         del item[key]
@@ -34,8 +47,10 @@ class DelTransform(ConditionalBlueprint):
 class InvertTransform(ConditionalBlueprint):
     def __iter__(self):
         key = self.options.get('key')
+        condition = self.condition
+        always = condition is ALWAYS
         for item in self.previous:
-            if self.condition(item) and is_mapping(item.get(key)):
+            if (always or condition(item)) and is_mapping(item.get(key)):
                 inverted = item.pop(key)
                 for key_, value in item.items():
                     inverted[key_] = value
@@ -47,8 +62,10 @@ class InvertTransform(ConditionalBlueprint):
 class WrapTransform(ConditionalBlueprint):
     def __iter__(self):
         key = self.options.get('key')
+        condition = self.condition
+        always = condition is ALWAYS
         for item in self.previous:
-            if self.condition(item) and key is not None:
+            if (always or condition(item)) and key is not None:
                 yield {key: item}
             else:
                 yield item
@@ -63,8 +80,10 @@ class CodecTransform(ConditionalBlueprint):
             from_, to_ = map(methodcaller('strip'), value.split(':', 1))
             transforms[name] = (from_, to_)
 
+        condition = self.condition
+        always = condition is ALWAYS
         for item in self.previous:
-            if self.condition(item):
+            if always or condition(item):
                 for name, value in transforms.items():
                     if name not in item:
                         continue
@@ -85,70 +104,271 @@ class CodecTransform(ConditionalBlueprint):
             yield item
 
 
+BLOCK_SIZE = 1024 * 1024
+RANGE_SIZE = 16 * 1024 * 1024
+
+FMTPARAMS = ('delimiter', 'doublequote', 'escapechar', 'lineterminator',
+             'quotechar', 'quoting', 'skipinitialspace', 'strict')
+
+
+def get_fmtparams(options):
+    """Return csv format parameters defined in options"""
+    fmtparams = {}
+    for name in FMTPARAMS:
+        value = options.get(name)
+        if value is None:
+            continue
+        if name in ['doublequote', 'skipinitialspace', 'strict']:
+            value = to_boolean(value)
+        elif name == 'quoting':
+            value = getattr(csv, 'QUOTE_' + value.strip().upper(), None)
+            if value is None:
+                value = int(options.get(name))
+        else:
+            value = codecs.decode(value, 'unicode_escape')
+            if PY2:
+                value = value.encode('utf-8')
+        fmtparams[name] = value
+    return fmtparams
+
+
+def iter_lines(fp, encoding, offset, end=None):
+    """Yield decoded lines from binary file while tracking the byte offset
+    after the last line in offset[0], optionally until the end offset
+    """
+    for line in fp:
+        offset[0] += len(line)
+        if PY2:
+            yield line
+        else:
+            yield line.decode(encoding)
+        if end is not None and offset[0] >= end:
+            break
+
+
+def get_ranges(path, start, end, size, quotechar=b'"'):
+    """Split byte range of a CSV file into ranges of about size bytes
+    aligned to record boundaries
+
+    Boundaries are placed after newlines outside quoted fields, which are
+    detected from the parity of the quote characters read since start.
+
+    """
+    ranges = []
+    quoted = False
+    target = start + size
+    offset = start  # file offset of the current block
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        while target < end:
+            block = fp.read(BLOCK_SIZE)
+            if not block:
+                break
+            index = 0
+            length = len(block)
+            while index < length and target < end:
+                if offset + index < target:
+                    next_ = min(length, target - offset)
+                else:
+                    next_ = block.find(b'\n', index)
+                    next_ = length if next_ == -1 else next_ + 1
+                if quotechar and block.count(quotechar, index, next_) % 2:
+                    quoted = not quoted
+                index = next_
+                if (offset + index >= target and not quoted and
+                        block[index - 1:index] == b'\n'):
+                    ranges.append((start, offset + index))
+                    start = offset + index
+                    target = start + size
+            offset += length
+    if start < end:
+        ranges.append((start, end))
+    return ranges
+
+
+def read_range(path, encoding, fmtparams, start, end):
+    """Return non-empty rows of the byte range of a CSV file as lists of
+    values with the offsets after each row
+    """
+    with open(path, 'rb') as fp:
+        fp.seek(start)
+        offset = [start]
+        reader = csv.reader(iter_lines(fp, encoding, offset, end),
+                            **fmtparams)
+        return [(row, offset[0]) for row in reader if row]
+
+
+def to_mapping(fieldnames, row):
+    """Return row values as a mapping like DictReader does"""
+    mapping = dict(zip(fieldnames, row))
+    if len(row) > len(fieldnames):
+        mapping[None] = row[len(fieldnames):]
+    elif len(row) < len(fieldnames):
+        for fieldname in fieldnames[len(row):]:
+            mapping[fieldname] = None
+    return mapping
+
+
+def read_ranges(path, encoding, fieldnames, fmtparams, start, workers,
+                size):
+    """Yield rows with offsets from a CSV file parsed in worker processes
+
+    The file is split into byte ranges, which are parsed in a pool of worker
+    processes and yielded in file order.
+
+    """
+    quotechar = None
+    if fmtparams.get('quoting') != csv.QUOTE_NONE:
+        quotechar = fmtparams.get('quotechar', '"')
+        if not isinstance(quotechar, bytes):
+            quotechar = quotechar.encode(encoding)
+    ranges = get_ranges(path, start, os.path.getsize(path), size, quotechar)
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(pool.apply_async(read_range, (
+                path, encoding, fmtparams, start, end)))
+            while len(pending) > workers * 2:
+                for row, offset in pending.popleft().get():
+                    yield to_mapping(fieldnames, row), offset
+        while pending:
+            for row, offset in pending.popleft().get():
+                yield to_mapping(fieldnames, row), offset
+    finally:
+        # Terminating the pool may kill a worker sending its result and
+        # deadlock the pool, so the few pending ranges are let to finish
+        pool.close()
+        pool.join()
+
+
 class CSVSource(Blueprint):
     def __iter__(self):
         for item in self.previous:
             yield item
 
         path = self.options.get('filename', 'input.csv').strip()
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        fieldnames = get_words(self.options.get('fieldnames')) or None
+        fmtparams = get_fmtparams(self.options)
+        workers = int(self.options.get('workers') or '1')
+        range_size = int(self.options.get('range_size') or RANGE_SIZE)
+        compression = get_compression(path, self.options.get('compression'))
 
         if path != '-' and not os.path.isabs(path):
             path = os.path.join(os.getcwd(), path)
+        seekable = path != '-' and compression is None
+
+        checkpoint = get_checkpoint(self.transmogrifier)
+        position = checkpoint and checkpoint.position(self.name) or (0, 0)
+        row, offset = position
 
-        fb_buffer = BytesIO()
         if path == '-':
-            fb_buffer.write(sys.stdin.read())
+            fp = getattr(sys.stdin, 'buffer', sys.stdin)
         else:
-            with open(path, 'r') as fb_input:
-                fb_buffer.write(fb_input.read())
-        fb_buffer.seek(0)
-
-        reader = DictReader(fb_buffer)
-        for row in reader:
-            yield row
+            fp = open(path, 'rb')
+        if compression is not None:
+            fp = io.BufferedReader(DecompressingReader(
+                fp, compression, closefd=path != '-'), BLOCK_SIZE)
+
+        try:
+            counter = [0]
+            reader = DictReader(iter_lines(fp, encoding, counter),
+                                fieldnames, **fmtparams)
+            rows = ((row_, counter[0]) for row_ in reader)
+            skip = row
+            if seekable and (offset or workers > 1):
+                # Read the header before resuming from the byte offset
+                reader.fieldnames  # noqa
+                offset = offset or counter[0]
+                skip = 0
+                if (workers > 1 and reader.fieldnames is not None and
+                        'escapechar' not in fmtparams):
+                    rows = read_ranges(path, encoding, reader.fieldnames,
+                                       fmtparams, offset, workers, range_size)
+                else:
+                    fp.seek(offset)
+                    counter[0] = offset
+
+            for row, end in rows:
+                position = (position[0] + 1, end)
+                if position[0] <= skip:
+                    continue
+                if checkpoint is not None:
+                    checkpoint.register(self.name, row, position)
+                yield row
+        finally:
+            if path != '-' or compression is not None:
+                fp.close()
 
 
 class CSVConstructor(ConditionalBlueprint):
     def __iter__(self):  # flake8: noqa
         path = self.options.get('filename', 'output.csv').strip()
         fieldnames = get_words(self.options.get('fieldnames'))
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        buffer_size = int(self.options.get('buffer_size') or
+                          io.DEFAULT_BUFFER_SIZE)
+        flush_interval = int(self.options.get('flush_interval') or '0')
+        fsync = to_boolean(self.options.get('fsync'))
+        fmtparams = get_fmtparams(self.options)
+        compression = get_compression(path, self.options.get('compression'))
 
         if path != '-' and not os.path.isabs(path):
             path = os.path.join(os.getcwd(), path)
 
-        if sys.version_info[0] < 3:
-            fp = BytesIO()
+        # Resumed runs continue the output of the interrupted run
+        append = path != '-' and is_resuming(self.transmogrifier)
+        header = not (append and os.path.isfile(path) and
+                      os.path.getsize(path))
+        mode = append and 'a' or 'w'
+
+        if compression is not None:
+            if path == '-':
+                fp = getattr(sys.stdout, 'buffer', sys.stdout)
+            else:
+                fp = open(path, mode + 'b')
+            fp = CompressingWriter(fp, compression, buffer_size,
+                                   closefd=path != '-')
+            if not PY2:
+                fp = io.TextIOWrapper(fp, encoding=encoding, newline='')
+        elif path == '-':
+            fp = sys.stdout
+        elif PY2:
+            fp = open(path, mode + 'b', buffer_size)
         else:
-            fp = StringIO()
-        writer = DictWriter(fp, list(fieldnames))
+            fp = open(path, mode, buffer_size, encoding=encoding, newline='')
+        writer = csv.writer(fp, **fmtparams)
 
         counter = 0
-        for item in self.previous:
-            if self.condition(item) and is_mapping(item):
-                if not writer.fieldnames:
-                    writer.fieldnames = [key for key in item.keys()
-                                         if not key.startswith('_')]
-                if counter == 0:
-                    header = dict(zip(writer.fieldnames, writer.fieldnames))
-                    writer.writerow(header)
-
-                clone = dict(item)
-                for fieldname in writer.fieldnames:
-                    clone.setdefault(fieldname, None)
-                writer.writerow(dict([
-                    (key, value) for key, value in clone.items()
-                    if key in writer.fieldnames
-                ]))
-                counter += 1
-
-            yield item
-        fp.seek(0)
+        condition = self.condition
+        always = condition is ALWAYS
+        try:
+            for item in self.previous:
+                if (always or condition(item)) and is_mapping(item):
+                    if not fieldnames:
+                        fieldnames = [key for key in item.keys()
+                                      if not key.startswith('_')]
+                    if counter == 0 and header:
+                        writer.writerow(fieldnames)
+
+                    get = item.get
+                    writer.writerow([get(fieldname)
+                                     for fieldname in fieldnames])
+                    counter += 1
+
+                    if flush_interval and counter % flush_interval == 0:
+                        fp.flush()
+                        if fsync:
+                            os.fsync(fp.fileno())
 
-        if path == '-':
-            sys.stdout.write(fp.read())
-        else:
-            with open(path, 'w') as fp2:
-                fp2.write(fp.read())
+                yield item
+        finally:
+            if path == '-' and compression is None:
+                fp.flush()
+            else:
+                fp.close()
 
         logger.info('{0:s}:{1:s} wrote {2:d} items to {3:s}'.format(
             self.__class__.__name__, self.name, counter, path,
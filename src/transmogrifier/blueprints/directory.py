@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from multiprocessing.pool import ThreadPool
+import logging
+import os
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    from scandir import scandir
+
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.utils import Matcher
+from transmogrifier.utils import get_lines
+from transmogrifier.utils import to_boolean
+
+logger = logging.getLogger('transmogrifier')
+
+
+class FileItem(dict):
+    """Item of a file, which reads the file contents into ``_data`` key on
+    the first access
+    """
+    def __missing__(self, key):
+        if key != '_data' or self.get('_type') != 'file':
+            raise KeyError(key)
+        with open(dict.__getitem__(self, '_filename'), 'rb') as fp:
+            data = self['_data'] = fp.read()
+        return data
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if key == '_data' and dict.get(self, '_type') == 'file':
+            return True
+        return dict.__contains__(self, key)
+
+
+def stat_entry(entry):
+    try:
+        return entry.stat()
+    except OSError:
+        return None
+
+
+class DirectorySource(Blueprint):
+    """Yield an item for each file below the directory of ``path`` option
+
+    Entries are walked in sorted order with ``os.scandir``. Items have the
+    path relative to the directory in ``_path``, the absolute path in
+    ``_filename``, and ``file`` or ``directory`` in ``_type``. The contents of
+    a file are read into ``_data`` when the key is first accessed. With
+    ``stat`` option, ``_size`` and ``_mtime`` are set from the file status,
+    fetched by a pool of ``workers`` threads. Directories, which cannot be
+    listed, are logged and skipped like ``os.walk`` does with ``onerror``.
+
+    """
+    def __iter__(self):
+        for item in self.previous:
+            yield item
+
+        path = self.options.get('path', '.').strip()
+        include = get_lines(self.options.get('include'))
+        include = include and Matcher(*include) or None
+        exclude = Matcher(*get_lines(self.options.get('exclude')))
+        recursive = to_boolean(self.options.get('recursive', 'true'))
+        directories = to_boolean(self.options.get('directories'))
+        follow_symlinks = to_boolean(self.options.get('follow_symlinks'))
+        stat = to_boolean(self.options.get('stat'))
+        workers = int(self.options.get('workers') or '1')
+
+        if not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        checkpoint = get_checkpoint(self.transmogrifier)
+        skip = checkpoint and checkpoint.position(self.name) or 0
+
+        pool = stat and workers > 1 and ThreadPool(workers) or None
+
+        def walk(path, prefix):
+            try:
+                listing = sorted(scandir(path), key=lambda entry: entry.name)
+            except OSError as e:
+                logger.warning('{0:s}:{1:s} cannot list {2:s}: {3!s}'.format(
+                    self.__class__.__name__, self.name, path, e))
+                return
+            entries = []
+            for entry in listing:
+                relative = prefix + entry.name
+                if exclude(relative, entry.name)[1]:
+                    continue
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+                except OSError:
+                    continue
+                if (not is_dir and include is not None and
+                        not include(relative, entry.name)[1]):
+                    continue
+                entries.append((entry, relative, is_dir))
+
+            statuses = [entry for entry, relative, is_dir in entries]
+            if not stat:
+                statuses = [None] * len(entries)
+            elif pool is not None:
+                statuses = pool.map(stat_entry, statuses)
+            else:
+                statuses = [stat_entry(entry) for entry in statuses]
+
+            for (entry, relative, is_dir), status in zip(entries, statuses):
+                if not is_dir or directories:
+                    item = FileItem()
+                    item['_path'] = relative
+                    item['_filename'] = entry.path
+                    item['_type'] = is_dir and 'directory' or 'file'
+                    if status is not None:
+                        item['_size'] = status.st_size
+                        item['_mtime'] = status.st_mtime
+                    yield item
+                if is_dir and recursive:
+                    for item in walk(entry.path, relative + '/'):
+                        yield item
+
+        try:
+            number = 0
+            for item in walk(path, ''):
+                number += 1
+                if number <= skip:
+                    continue
+                if checkpoint is not None:
+                    checkpoint.register(self.name, item, number)
+                yield item
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
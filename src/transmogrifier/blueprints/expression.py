@@ -1,25 +1,31 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from functools import wraps
 import importlib
+import logging
 
 from transmogrifier.blueprints import Blueprint
 from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.compat import is_installed
+from transmogrifier.condition import ALWAYS
 from transmogrifier.expression import Expression
+from transmogrifier.expression import MemoizedExpression
 from transmogrifier.utils import is_mapping
+from transmogrifier.utils import get_chunks
+from transmogrifier.utils import get_lines
 from transmogrifier.utils import get_words
 
 from zope.interface.exceptions import BrokenImplementation
 
-import pkg_resources
-
-try:
-    pkg_resources.get_distribution('Acquisition')
-except pkg_resources.DistributionNotFound:
-    HAS_ACQUISITION = False
-else:
+if is_installed('Acquisition'):
     import Acquisition
     HAS_ACQUISITION = True
+else:
+    HAS_ACQUISITION = False
+
+logger = logging.getLogger('transmogrifier')
 
 
 def unwrap(item):
@@ -31,14 +37,39 @@ def unwrap(item):
         return item
 
 
+def get_memoize(options, section=''):
+    """Return mapping of memoized expression names to their input item keys
+
+    ``memoize`` option lists one expression per line as ``name: key ...``.
+
+    """
+    memoize = {}
+    for line in get_lines(options.get('memoize')):
+        name, separator, keys = line.partition(':')
+        if not separator or not name.strip():
+            raise ValueError(
+                'Invalid memoize option in section {0:s}: {1:s} '
+                '(expected "name: key ...")'.format(section, line))
+        memoize[name.strip()] = get_words(keys)
+    return memoize
+
+
 def get_expressions(blueprint, whitelist=None, blacklist=None):
+    """Return sorted (name, expression) pairs for the blueprint options
+
+    Memoized expressions are also stored into ``memoized`` of the blueprint.
+
+    """
     expressions = {}
+    memoize = get_memoize(blueprint.options, blueprint.name)
+    memoize_size = int(blueprint.options.get('memoize_size') or '1000')
 
     def in_whitelist(x):
         return not whitelist or x in whitelist
 
     def in_blacklist(x):
-        return blacklist and x in blacklist
+        return (blacklist and x in blacklist) or \
+            x in ['memoize', 'memoize_size']
 
     for name, value in blueprint.options.items():
         if in_blacklist(name) or not in_whitelist(name):
@@ -47,9 +78,44 @@ def get_expressions(blueprint, whitelist=None, blacklist=None):
             value or 'python:True',
             blueprint.transmogrifier, blueprint.name, blueprint.options
         )
+        if name in memoize:
+            expressions[name] = MemoizedExpression(
+                expressions[name], memoize[name], memoize_size)
+
+    unknown = sorted(set(memoize) - set(expressions))
+    if unknown:
+        raise ValueError(
+            'Unknown memoized expressions in section {0:s}: {1:s}'.format(
+                blueprint.name, ', '.join(unknown)))
+    blueprint.memoized = dict((name, expressions[name]) for name in memoize)
     return sorted(expressions.items(), key=lambda x: x[0])
 
 
+def report_memoized(func):
+    """Decorate section ``__iter__`` to log the cache statistics of its
+    memoized expressions when the section is exhausted or closed
+    """
+    def report(blueprint, items):
+        try:
+            for item in items:
+                yield item
+        finally:
+            memoized = getattr(blueprint, 'memoized', {})
+            for name, expression in sorted(memoized.items()):
+                logger.info(
+                    '{0:s}:{1:s} memoized {2:s}: {hits:d} hits, '
+                    '{misses:d} misses, {size:d}/{maxsize:d} cached'.format(
+                        blueprint.__class__.__name__, blueprint.name, name,
+                        **expression.cache_info()))
+
+    @wraps(func)
+    def __iter__(self):
+        if not self.options.get('memoize'):
+            return func(self)
+        return report(self, func(self))
+    return __iter__
+
+
 def import_modules(modules):
     for module in modules:
         importlib.import_module(module)
@@ -57,6 +123,7 @@ def import_modules(modules):
 
 class ExpressionSource(ConditionalBlueprint):
     """Generate items from expressions result"""
+    @report_memoized
     def __iter__(self):
         for item in self.previous:
             yield item
@@ -68,20 +135,30 @@ class ExpressionSource(ConditionalBlueprint):
         )
         assert expressions, 'No expressions defined'
 
+        checkpoint = get_checkpoint(self.transmogrifier)
+        skip = checkpoint and checkpoint.position(self.name) or 0
+
         for name, expression in expressions:
-            for item in (expression(None) or []):
+            for position, item in enumerate(expression(None) or [], 1):
+                if position <= skip:
+                    continue
                 try:
                     if is_mapping(unwrap(item)):
-                        if self.condition(item):
-                            yield item
+                        if not self.condition(item):
+                            continue
                 except BrokenImplementation:
-                    if self.condition({name: item}):
-                        yield {name: item}
+                    item = {name: item}
+                    if not self.condition(item):
+                        continue
+                if checkpoint is not None:
+                    checkpoint.register(self.name, item, position)
+                yield item
             break
 
 
 class ExpressionSetter(ConditionalBlueprint):
     """Set item keys from expressions result"""
+    @report_memoized
     def __iter__(self):
         import_modules(get_words(self.options.get('modules')))
         expressions = get_expressions(
@@ -90,9 +167,11 @@ class ExpressionSetter(ConditionalBlueprint):
         )
         assert expressions, 'No expressions defined'
 
+        condition = self.condition
+        always = condition is ALWAYS
         for item in self.previous:
             extras = is_mapping(item) and item or {}
-            if self.condition(item, **extras) and is_mapping(item):
+            if (always or condition(item, **extras)) and is_mapping(item):
                 for name, expression in expressions:
                     item[name] = expression(item, **extras)
             yield item
@@ -100,6 +179,7 @@ class ExpressionSetter(ConditionalBlueprint):
 
 class ExpressionTransform(ConditionalBlueprint):
     """Executes expressions with items allowing transform or construction"""
+    @report_memoized
     def __iter__(self):
         import_modules(get_words(self.options.get('modules')))
         expressions = get_expressions(
@@ -108,9 +188,11 @@ class ExpressionTransform(ConditionalBlueprint):
         )
         assert expressions, 'No expressions defined'
 
+        condition = self.condition
+        always = condition is ALWAYS
         for item in self.previous:
             extras = is_mapping(item) and item or {}
-            if self.condition(item, **extras):
+            if always or condition(item, **extras):
                 for name, expression in expressions:
                     expression(item, **extras)
             yield item
@@ -118,6 +200,7 @@ class ExpressionTransform(ConditionalBlueprint):
 
 class ExpressionFilterAnd(Blueprint):
     """Filter items by expressions (AND)"""
+    @report_memoized
     def __iter__(self):
         import_modules(get_words(self.options.get('modules')))
         expressions = get_expressions(
@@ -137,6 +220,7 @@ class ExpressionFilterAnd(Blueprint):
 
 class ExpressionFilterOr(Blueprint):
     """Filter items by expressions (OR)"""
+    @report_memoized
     def __iter__(self):
         import_modules(get_words(self.options.get('modules')))
         expressions = get_expressions(
@@ -152,8 +236,103 @@ class ExpressionFilterOr(Blueprint):
                     break
 
 
+def get_batch_size(options, section=''):
+    batch_size = int(options.get('batch_size') or '100')
+    if batch_size < 1:
+        raise ValueError(
+            'Invalid batch_size option in section {0:s}: {1:d} '
+            '(expected a positive number)'.format(section, batch_size))
+    return batch_size
+
+
+def get_extras(items):
+    return [item if is_mapping(item) else {} for item in items]
+
+
+class ExpressionBatchSetter(ConditionalBlueprint):
+    """Set item keys from expressions result evaluated in batches"""
+    @report_memoized
+    def __iter__(self):
+        import_modules(get_words(self.options.get('modules')))
+        expressions = get_expressions(
+            self, get_words(self.options.get('expressions')),
+            ['blueprint', 'modules', 'condition', 'expressions',
+             'batch_size']
+        )
+        assert expressions, 'No expressions defined'
+
+        batch_size = get_batch_size(self.options, self.name)
+        for items in get_chunks(self.previous, batch_size):
+            extras = get_extras(items)
+            matches = self.condition.batch(items, extras)
+            selected = [(item, extras_) for item, extras_, match
+                        in zip(items, extras, matches)
+                        if match and extras_ is item]
+            if selected:
+                items_, extras_ = map(list, zip(*selected))
+                for name, expression in expressions:
+                    for item, value in zip(
+                            items_, expression.batch(items_, extras_)):
+                        item[name] = value
+            for item in items:
+                yield item
+
+
+class ExpressionBatchFilterAnd(Blueprint):
+    """Filter items by expressions evaluated in batches (AND)"""
+    @report_memoized
+    def __iter__(self):
+        import_modules(get_words(self.options.get('modules')))
+        expressions = get_expressions(
+            self, get_words(self.options.get('expressions')),
+            ['blueprint', 'modules', 'expressions', 'batch_size']
+        )
+
+        batch_size = get_batch_size(self.options, self.name)
+        for items in get_chunks(self.previous, batch_size):
+            extras = get_extras(items)
+            matches = list(range(len(items)))
+            for name, expression in expressions:
+                if not matches:
+                    break
+                results = expression.batch([items[i] for i in matches],
+                                           [extras[i] for i in matches])
+                matches = [i for i, result in zip(matches, results)
+                           if result]
+            for i in matches:
+                yield items[i]
+
+
+class ExpressionBatchFilterOr(Blueprint):
+    """Filter items by expressions evaluated in batches (OR)"""
+    @report_memoized
+    def __iter__(self):
+        import_modules(get_words(self.options.get('modules')))
+        expressions = get_expressions(
+            self, get_words(self.options.get('expressions')),
+            ['blueprint', 'modules', 'expressions', 'batch_size']
+        )
+
+        batch_size = get_batch_size(self.options, self.name)
+        for items in get_chunks(self.previous, batch_size):
+            extras = get_extras(items)
+            pending = list(range(len(items)))
+            matches = set()
+            for name, expression in expressions:
+                if not pending:
+                    break
+                results = expression.batch([items[i] for i in pending],
+                                           [extras[i] for i in pending])
+                matches.update(i for i, result in zip(pending, results)
+                               if result)
+                pending = [i for i in pending if i not in matches]
+            for i in sorted(matches):
+                yield items[i]
+
+
 class ExpressionInterval(ConditionalBlueprint):
     """Perform standalone expressions by defined interval"""
+    @report_memoized
     def __iter__(self):
         import_modules(get_words(self.options.get('modules')))
         expressions = get_expressions(
@@ -164,8 +343,10 @@ class ExpressionInterval(ConditionalBlueprint):
 
         counter = interval = int(self.options.get('interval', '1'))
 
+        condition = self.condition
+        always = condition is ALWAYS
         for item in self.previous:
-            if self.condition(item):
+            if always or condition(item):
                 counter -= 1
                 if counter == 0:
                     for name, expression in expressions:
@@ -180,6 +361,7 @@ class ExpressionInterval(ConditionalBlueprint):
 
 class ExpressionFinally(Blueprint):
     """Perform standalone expressions at the end, also on exception"""
+    @report_memoized
     def __iter__(self):
         import_modules(get_words(self.options.get('modules')))
         expressions = get_expressions(
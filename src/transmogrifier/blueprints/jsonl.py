@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from functools import partial
+from importlib import import_module
+import codecs
+import io
+import json
+import os
+import sys
+import logging
+
+from six import string_types
+
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.blueprints.data import BLOCK_SIZE
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.checkpoint import is_resuming
+from transmogrifier.compression import CompressingWriter
+from transmogrifier.compression import DecompressingReader
+from transmogrifier.compression import get_compression
+from transmogrifier.condition import ALWAYS
+from transmogrifier.expression import Expression
+from transmogrifier.utils import is_mapping
+
+
+logger = logging.getLogger('transmogrifier')
+
+
+def get_json_loads(options):
+    """Return loads function of the JSON module named in options"""
+    return import_module(options.get('json', 'json').strip()).loads
+
+
+def get_json_dumps(options, default=None):
+    """Return dumps function of the JSON module named in options producing
+    compact single line documents
+    """
+    name = options.get('json', 'json').strip()
+    if name == 'json':
+        return json.JSONEncoder(ensure_ascii=False, separators=(',', ':'),
+                                default=default).encode
+    dumps = import_module(name).dumps
+    if default is not None:
+        dumps = partial(dumps, default=default)
+    return dumps
+
+
+class JSONLinesSource(Blueprint):
+    def __iter__(self):
+        for item in self.previous:
+            yield item
+
+        path = self.options.get('filename', 'input.jsonl').strip()
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        compression = get_compression(path, self.options.get('compression'))
+        loads = get_json_loads(self.options)
+
+        if path != '-' and not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        checkpoint = get_checkpoint(self.transmogrifier)
+        position = checkpoint and checkpoint.position(self.name) or (0, 0)
+        skip, offset = position
+
+        if path == '-':
+            fp = getattr(sys.stdin, 'buffer', sys.stdin)
+        else:
+            fp = open(path, 'rb')
+        if compression is not None:
+            fp = io.BufferedReader(DecompressingReader(
+                fp, compression, closefd=path != '-'), BLOCK_SIZE)
+        elif offset and path != '-':
+            fp.seek(offset)
+            skip = 0
+
+        decode = codecs.lookup(encoding).name != 'utf-8'
+        number = position[0] - skip
+        try:
+            for line in fp:
+                number += 1
+                offset += len(line)
+                if number <= skip or not line.strip():
+                    continue
+                item = loads(line.decode(encoding) if decode else line)
+                if checkpoint is not None:
+                    checkpoint.register(self.name, item, (number, offset))
+                yield item
+        finally:
+            if path != '-' or compression is not None:
+                fp.close()
+
+
+class JSONLinesConstructor(ConditionalBlueprint):
+    def __iter__(self):
+        path = self.options.get('filename', 'output.jsonl').strip()
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        compression = get_compression(path, self.options.get('compression'))
+        buffer_size = int(self.options.get('buffer_size') or
+                          io.DEFAULT_BUFFER_SIZE)
+        batch_size = int(self.options.get('batch_size') or '100')
+
+        default = self.options.get('default')
+        if default:
+            default = Expression(default, self.transmogrifier, self.name,
+                                 self.options)
+        dumps = get_json_dumps(self.options, default or None)
+
+        if path != '-' and not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        if path == '-':
+            fp = getattr(sys.stdout, 'buffer', sys.stdout)
+        elif is_resuming(self.transmogrifier):
+            # Resumed runs continue the output of the interrupted run
+            fp = open(path, 'ab', buffer_size)
+        else:
+            fp = open(path, 'wb', buffer_size)
+        if compression is not None:
+            fp = CompressingWriter(fp, compression, buffer_size,
+                                   closefd=path != '-')
+
+        lines = []
+        counter = 0
+        condition = self.condition
+        always = condition is ALWAYS
+        try:
+            for item in self.previous:
+                if (always or condition(item)) and is_mapping(item):
+                    line = dumps(dict(
+                        (key, value) for key, value in item.items()
+                        if not (isinstance(key, string_types) and
+                                key.startswith('_'))))
+                    if not isinstance(line, bytes):
+                        line = line.encode(encoding)
+                    lines.append(line)
+                    counter += 1
+                    if len(lines) >= batch_size:
+                        lines.append(b'')
+                        fp.write(b'\n'.join(lines))
+                        lines = []
+
+                yield item
+        finally:
+            try:
+                if lines:
+                    lines.append(b'')
+                    fp.write(b'\n'.join(lines))
+            finally:
+                if path == '-' and compression is None:
+                    fp.flush()
+                else:
+                    fp.close()
+
+        logger.info('{0:s}:{1:s} wrote {2:d} items to {3:s}'.format(
+            self.__class__.__name__, self.name, counter, path))
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+import io
+import mmap
+import os
+import sys
+
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.blueprints.data import BLOCK_SIZE
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.compression import DecompressingReader
+from transmogrifier.compression import get_compression
+from transmogrifier.jsonstream import iter_path
+from transmogrifier.utils import to_boolean
+
+
+class JSONSource(Blueprint):
+    def __iter__(self):
+        for item in self.previous:
+            yield item
+
+        path = self.options.get('filename', 'input.json').strip()
+        encoding = self.options.get('encoding', 'utf-8').strip()
+        compression = get_compression(path, self.options.get('compression'))
+        json_path = self.options.get('path', '$[*]').strip()
+        use_mmap = to_boolean(self.options.get('mmap'))
+
+        if path != '-' and not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        checkpoint = get_checkpoint(self.transmogrifier)
+        skip = checkpoint and checkpoint.position(self.name) or 0
+
+        if path == '-':
+            fp = getattr(sys.stdin, 'buffer', sys.stdin)
+        else:
+            fp = open(path, 'rb')
+        if compression is not None:
+            fp = io.BufferedReader(DecompressingReader(
+                fp, compression, closefd=path != '-'), BLOCK_SIZE)
+        elif use_mmap and path != '-' and os.fstat(fp.fileno()).st_size:
+            fp.close()
+            with open(path, 'rb') as fp_:
+                fp = mmap.mmap(fp_.fileno(), 0, access=mmap.ACCESS_READ)
+
+        number = 0
+        try:
+            for item in iter_path(fp, json_path, encoding):
+                number += 1
+                if number <= skip:
+                    continue
+                if checkpoint is not None:
+                    checkpoint.register(self.name, item, number)
+                yield item
+        finally:
+            if path != '-' or compression is not None:
+                fp.close()
@@ -2,6 +2,7 @@
 import logging
 
 from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.condition import ALWAYS
 from transmogrifier.utils import Matcher
 from transmogrifier.utils import get_words
 from transmogrifier.utils import pformat_msg
@@ -29,8 +30,10 @@ class Logger(ConditionalBlueprint):
             level = int(logging.INFO)
         logger.setLevel(level)
 
+        condition = self.condition
+        always = condition is ALWAYS
         for item in self.previous:
-            if logger.isEnabledFor(level) and self.condition(item):
+            if logger.isEnabledFor(level) and (always or condition(item)):
                 if key is None:
                     copy = {}
                     for key_ in item.keys():
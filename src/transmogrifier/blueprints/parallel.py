@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import deque
+import multiprocessing
+
+from six import PY2
+from six.moves.queue import Queue
+from zope.component import getUtility
+
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.interfaces import ISectionBlueprint
+from transmogrifier.utils import constructPipeline
+from transmogrifier.utils import get_chunks
+from transmogrifier.utils import get_lines
+from transmogrifier.utils import to_boolean
+
+try:
+    multiprocessing = multiprocessing.get_context('fork')
+except AttributeError:  # Python 2 always forks on POSIX
+    pass
+
+# Worker state inherited by the forked worker processes
+_state = {}
+
+# Worker state prepared once in every worker process by its initializer
+_worker = {}
+
+
+def get_blueprints(transmogrifier, sections):
+    """Return mapping of blueprint ids of the sections to their blueprints
+    """
+    blueprints = {}
+    for section in sections:
+        blueprint_id = transmogrifier[section]['blueprint']
+        if blueprint_id not in blueprints:
+            blueprints[blueprint_id] = getUtility(
+                ISectionBlueprint, blueprint_id)
+    return blueprints
+
+
+def get_ordered(blueprint):
+    """Return the ordered option of the section, which must not be false
+    when the pipeline has a checkpoint
+    """
+    ordered = to_boolean(blueprint.options.get('ordered', 'true'))
+    if not ordered and get_checkpoint(blueprint.transmogrifier) is not None:
+        raise ValueError(
+            'Section {0:s} must keep the order of items, because the '
+            'pipeline has a checkpoint'.format(blueprint.name))
+    return ordered
+
+
+def init_worker(section):
+    """Prepare the sub-pipeline of the given parallel section once in
+    a worker process
+    """
+    transmogrifier, sections = _state[section]
+    _worker[section] = (transmogrifier, sections,
+                        get_blueprints(transmogrifier, sections))
+
+
+def process_chunk(section, items):
+    """Process items through the sub-pipeline of the given parallel section
+    in a worker process
+    """
+    transmogrifier, sections, blueprints = _worker[section]
+    return list(constructPipeline(transmogrifier, sections, iter(items),
+                                  blueprints=blueprints))
+
+
+class Failure(object):
+    """Marker of a failed task among the completed results"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class Results(object):
+    """Results of the tasks applied in a pool in their submission order or,
+    when not ordered, in their completion order
+    """
+    def __init__(self, pool, ordered):
+        self.pool = pool
+        # Python 2 pools have no error callbacks to report failed tasks
+        self.ordered = ordered or PY2
+        self.pending = deque()
+        self.completed = Queue()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def apply(self, func, args):
+        if self.ordered:
+            self.pending.append(self.pool.apply_async(func, args))
+        else:
+            self.pool.apply_async(func, args, callback=self.completed.put,
+                                  error_callback=self.failed)
+        self.count += 1
+
+    def failed(self, error):
+        self.completed.put(Failure(error))
+
+    def pop(self):
+        """Return the next result, waiting for it when necessary"""
+        self.count -= 1
+        if self.ordered:
+            return self.pending.popleft().get()
+        result = self.completed.get()
+        if isinstance(result, Failure):
+            raise result.error
+        return result
+
+
+class Parallel(Blueprint):
+    """Run sub-pipeline in a pool of worker processes
+
+    Items are sent to workers in chunks of ``chunk_size`` items and each
+    chunk is processed by a fresh sub-pipeline constructed in the worker
+    from the blueprints looked up once per worker, so sub-pipeline sections
+    should process items independently. Items must be picklable and the
+    worker processes are forked, inheriting the component registrations and
+    the configuration of the parent process. Unordered results are yielded
+    as soon as any chunk completes.
+
+    """
+    def __iter__(self):
+        sections = [section for section in
+                    get_lines(self.options.get('pipeline'))
+                    if section != self.name]
+        workers = int(self.options.get('workers') or
+                      multiprocessing.cpu_count())
+        chunk_size = int(self.options.get('chunk_size') or '100')
+        ordered = get_ordered(self)
+
+        if not sections:
+            for item in self.previous:
+                yield item
+            return
+
+        # Resolve options before forking to let workers inherit them
+        for section in sections:
+            self.transmogrifier[section].copy()
+
+        key = '{0:s}:{1:d}'.format(self.name, id(self))
+        _state[key] = (self.transmogrifier, sections)
+        pool = multiprocessing.Pool(workers, init_worker, (key,))
+        try:
+            results = Results(pool, ordered)
+            for chunk in get_chunks(self.previous, chunk_size):
+                results.apply(process_chunk, (key, chunk))
+                while len(results) > workers * 2:
+                    for item in results.pop():
+                        yield item
+            while results:
+                for item in results.pop():
+                    yield item
+        finally:
+            # Terminating the pool may kill a worker sending its result and
+            # deadlock the pool, so the few pending chunks are let to finish
+            pool.close()
+            pool.join()
+            del _state[key]
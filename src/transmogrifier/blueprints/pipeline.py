@@ -3,6 +3,7 @@ from __future__ import unicode_literals
 from zope.component import getUtility
 
 from transmogrifier.blueprints import Blueprint
+from transmogrifier.instrumentation import instrument
 from transmogrifier.interfaces import ISection
 from transmogrifier.interfaces import ISectionBlueprint
 from transmogrifier.utils import get_lines
@@ -44,6 +45,8 @@ class Pipeline(Blueprint):
             if not ISection.providedBy(pipeline):
                 raise ValueError('Blueprint %s for section %s did not return '
                                  'an ISection' % (blueprint_id, section_id))
+            pipeline = instrument(self.transmogrifier, section_id,
+                                  blueprint_id, pipeline)
 
         return iter(pipeline)
 
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import sys
+import threading
+
+from six import reraise
+from six.moves.queue import Full
+from six.moves.queue import Queue
+
+from transmogrifier.blueprints import Blueprint
+
+_ITEM = 'item'
+_END = 'end'
+_ERROR = 'error'
+
+
+class Prefetch(Blueprint):
+    """Read items ahead from the previous section on a background thread
+
+    Up to ``depth`` items are buffered. Exceptions from the previous sections
+    are raised after the items read before them. When the pipeline is closed
+    early, the previous sections are closed on the background thread before
+    this section returns.
+
+    """
+    def __iter__(self):
+        depth = int(self.options.get('depth') or '100')
+        queue = Queue(maxsize=depth)
+        stop = threading.Event()
+
+        def put(value):
+            while not stop.is_set():
+                try:
+                    queue.put(value, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def produce():
+            iterator = iter(self.previous)
+            try:
+                for item in iterator:
+                    if not put((_ITEM, item)):
+                        break
+                else:
+                    put((_END, None))
+            except BaseException:
+                put((_ERROR, sys.exc_info()))
+            finally:
+                close = getattr(iterator, 'close', None)
+                if close is not None:
+                    close()
+
+        thread = threading.Thread(target=produce, name=self.name)
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                marker, value = queue.get()
+                if marker == _ITEM:
+                    yield value
+                elif marker == _END:
+                    break
+                else:
+                    reraise(*value)
+        finally:
+            stop.set()
+            thread.join()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import os
+import logging
+
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.checkpoint import is_resuming
+from transmogrifier.condition import ALWAYS
+from transmogrifier.spool import BLOCK_SIZE
+from transmogrifier.spool import SpoolReader
+from transmogrifier.spool import SpoolWriter
+from transmogrifier.spool import get_shard
+from transmogrifier.utils import is_mapping
+from transmogrifier.utils import to_boolean
+
+
+logger = logging.getLogger('transmogrifier')
+
+
+class SpoolSource(Blueprint):
+    def __iter__(self):
+        for item in self.previous:
+            yield item
+
+        path = self.options.get('filename', 'input.spool').strip()
+        use_mmap = to_boolean(self.options.get('mmap', 'true'))
+        shard = self.options.get('shard', '').strip()
+
+        if not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        reader = SpoolReader(path, use_mmap)
+        try:
+            start = int(self.options.get('start') or '0')
+            stop = int(self.options.get('stop') or len(reader))
+            if shard:
+                shard_start, shard_stop = get_shard(shard, len(reader))
+                start = max(start, shard_start)
+                stop = min(stop, shard_stop)
+
+            checkpoint = get_checkpoint(self.transmogrifier)
+            if checkpoint is not None:
+                start = max(start, checkpoint.position(self.name) or 0)
+
+            for number, item in reader.iter_slice(start, stop):
+                if checkpoint is not None:
+                    checkpoint.register(self.name, item, number + 1)
+                yield item
+        finally:
+            reader.close()
+
+
+class SpoolConstructor(ConditionalBlueprint):
+    def __iter__(self):
+        path = self.options.get('filename', 'output.spool').strip()
+        block_size = int(self.options.get('block_size') or BLOCK_SIZE)
+        compression = self.options.get('compression', 'none')
+
+        if not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        if is_resuming(self.transmogrifier):
+            # Resumed runs continue the output of the interrupted run
+            writer = SpoolWriter.append(path, compression, block_size)
+        else:
+            writer = SpoolWriter(open(path, 'wb'), compression, block_size)
+
+        counter = 0
+        condition = self.condition
+        always = condition is ALWAYS
+        try:
+            for item in self.previous:
+                if (always or condition(item)) and is_mapping(item):
+                    writer.write(item)
+                    counter += 1
+                yield item
+        finally:
+            writer.close()
+
+        logger.info('{0:s}:{1:s} wrote {2:d} items to {3:s}'.format(
+            self.__class__.__name__, self.name, counter, path))
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import logging
+import os
+import sqlite3
+
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.blueprints import ConditionalBlueprint
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.condition import ALWAYS
+from transmogrifier.utils import get_words
+from transmogrifier.utils import is_mapping
+from transmogrifier.utils import to_boolean
+
+logger = logging.getLogger('transmogrifier')
+
+MODES = ('insert', 'replace', 'ignore', 'upsert')
+
+
+def quote(name):
+    """Return quoted SQL identifier"""
+    return '"{0:s}"'.format(name.replace('"', '""'))
+
+
+def get_database(options):
+    path = options.get('database', 'transmogrifier.db').strip()
+    if path != ':memory:' and not os.path.isabs(path):
+        path = os.path.join(os.getcwd(), path)
+    return path
+
+
+def get_create_statement(table, columns, keys=()):
+    definitions = [quote(column) for column in columns]
+    if keys:
+        definitions.append('PRIMARY KEY ({0:s})'.format(
+            ', '.join(map(quote, keys))))
+    return 'CREATE TABLE IF NOT EXISTS {0:s} ({1:s})'.format(
+        quote(table), ', '.join(definitions))
+
+
+def get_insert_statement(table, columns, mode='insert', keys=()):
+    """Return parametrized insert statement for the given mode
+
+    ``insert`` fails on conflicting rows, ``replace`` replaces them,
+    ``ignore`` skips them and ``upsert`` updates their non-key columns.
+
+    """
+    if mode not in MODES:
+        raise ValueError('Unknown mode: {0:s}'.format(mode))
+    verb = {
+        'replace': 'INSERT OR REPLACE',
+        'ignore': 'INSERT OR IGNORE',
+    }.get(mode, 'INSERT')
+    statement = '{0:s} INTO {1:s} ({2:s}) VALUES ({3:s})'.format(
+        verb, quote(table), ', '.join(map(quote, columns)),
+        ', '.join('?' * len(columns)))
+    if mode == 'upsert':
+        if not keys:
+            raise ValueError('Upsert mode requires key columns')
+        updates = ['{0:s} = excluded.{0:s}'.format(quote(column))
+                   for column in columns if column not in keys]
+        statement += ' ON CONFLICT ({0:s}) DO {1:s}'.format(
+            ', '.join(map(quote, keys)),
+            updates and 'UPDATE SET ' + ', '.join(updates) or 'NOTHING')
+    return statement
+
+
+def rollback(connection):
+    """Roll back the open transaction without hiding the original error"""
+    try:
+        connection.execute('ROLLBACK')
+    except sqlite3.Error as e:
+        logger.warning('Rollback failed: {0!s}'.format(e))
+
+
+class SQLiteSource(Blueprint):
+    def __iter__(self):
+        for item in self.previous:
+            yield item
+
+        database = get_database(self.options)
+        query = self.options.get('query')
+        if not query:
+            query = 'SELECT * FROM {0:s}'.format(
+                quote(self.options['table'].strip()))
+        batch_size = int(self.options.get('batch_size') or '1000')
+
+        checkpoint = get_checkpoint(self.transmogrifier)
+        skip = checkpoint and checkpoint.position(self.name) or 0
+
+        connection = sqlite3.connect(database)
+        try:
+            cursor = connection.execute(query)
+            names = [description[0] for description in
+                     cursor.description or ()]
+            number = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    number += 1
+                    if number <= skip:
+                        continue
+                    item = dict(zip(names, row))
+                    if checkpoint is not None:
+                        checkpoint.register(self.name, item, number)
+                    yield item
+        finally:
+            connection.close()
+
+
+class Transaction(object):
+    """Rows inserted in batches within explicitly committed transactions"""
+
+    def __init__(self, connection, statement, batch_size):
+        self.connection = connection
+        self.statement = statement
+        self.batch_size = batch_size
+        self.rows = []
+        self.uncommitted = 0
+        self.connection.execute('BEGIN')
+
+    def insert(self, row):
+        self.rows.append(row)
+        self.uncommitted += 1
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.connection.executemany(self.statement, self.rows)
+            self.rows = []
+
+    def commit(self, begin=True):
+        self.flush()
+        self.connection.execute('COMMIT')
+        self.uncommitted = 0
+        if begin:
+            self.connection.execute('BEGIN')
+
+    def rollback(self):
+        rollback(self.connection)
+
+
+class SQLiteConstructor(ConditionalBlueprint):
+    def __iter__(self):  # flake8: noqa
+        database = get_database(self.options)
+        table = self.options['table'].strip()
+        columns = get_words(self.options.get('columns'))
+        keys = get_words(self.options.get('key'))
+        mode = self.options.get('mode', 'insert').strip().lower()
+        create = to_boolean(self.options.get('create', 'true'))
+        batch_size = int(self.options.get('batch_size') or '1000')
+        transaction_size = int(self.options.get('transaction_size') or
+                               '10000')
+
+        # With a checkpoint, rows are committed when its state is saved, so
+        # that the saved positions never include rolled back rows
+        checkpoint = get_checkpoint(self.transmogrifier)
+
+        # Transactions are managed explicitly
+        connection = sqlite3.connect(database, isolation_level=None)
+        transaction = None
+        counter = 0
+        condition = self.condition
+        always = condition is ALWAYS
+        try:
+            for item in self.previous:
+                if (always or condition(item)) and is_mapping(item):
+                    if transaction is None:
+                        if not columns:
+                            columns = [key for key in item.keys()
+                                       if not key.startswith('_')]
+                        if create:
+                            connection.execute(get_create_statement(
+                                table, columns, keys))
+                        transaction = Transaction(
+                            connection,
+                            get_insert_statement(table, columns, mode, keys),
+                            batch_size)
+                        if checkpoint is not None:
+                            checkpoint.hold(transaction.commit)
+
+                    get = item.get
+                    transaction.insert([get(column) for column in columns])
+                    counter += 1
+
+                    if checkpoint is None and \
+                            transaction.uncommitted >= transaction_size:
+                        transaction.commit()
+
+                yield item
+
+            if transaction is not None:
+                transaction.commit(begin=False)
+                if checkpoint is not None:
+                    checkpoint.release(transaction.commit)
+        except GeneratorExit:
+            # Closed before the end of the pipeline, usually after a failure
+            if transaction is not None:
+                logger.warning(
+                    '{0:s}:{1:s} closed before the end of the pipeline, '
+                    'discarding {2:d} uncommitted rows'.format(
+                        self.__class__.__name__, self.name,
+                        transaction.uncommitted))
+                transaction.rollback()
+            raise
+        except Exception:
+            if transaction is not None:
+                transaction.rollback()
+            raise
+        finally:
+            connection.close()
+
+        logger.info('{0:s}:{1:s} wrote {2:d} items to {3:s}'.format(
+            self.__class__.__name__, self.name, counter, table))
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from multiprocessing.pool import ThreadPool
+
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.blueprints.parallel import Results
+from transmogrifier.blueprints.parallel import get_blueprints
+from transmogrifier.blueprints.parallel import get_ordered
+from transmogrifier.utils import constructPipeline
+from transmogrifier.utils import get_lines
+
+
+def process_item(transmogrifier, sections, blueprints, item):
+    """Process a single item through the sub-pipeline in a worker thread"""
+    return list(constructPipeline(transmogrifier, sections, iter([item]),
+                                  blueprints=blueprints))
+
+
+class Threaded(Blueprint):
+    """Run sub-pipeline for each item in a pool of worker threads
+
+    Each item is processed by a fresh sub-pipeline, which lets I/O bound
+    sections overlap their latency. At most ``in_flight`` items are being
+    processed at once. Items are yielded in their original order unless
+    ``ordered`` is set to false.
+
+    """
+    def __iter__(self):
+        sections = [section for section in
+                    get_lines(self.options.get('pipeline'))
+                    if section != self.name]
+        workers = int(self.options.get('workers') or '4')
+        in_flight = int(self.options.get('in_flight') or workers * 2)
+        ordered = get_ordered(self)
+
+        if not sections:
+            for item in self.previous:
+                yield item
+            return
+
+        # Resolve options before the threads may race on them
+        for section in sections:
+            self.transmogrifier[section].copy()
+        blueprints = get_blueprints(self.transmogrifier, sections)
+
+        pool = ThreadPool(workers)
+        completed = False
+        try:
+            results = Results(pool, ordered)
+            for item in self.previous:
+                results.apply(process_item, (self.transmogrifier, sections,
+                                             blueprints, item))
+                while len(results) >= in_flight:
+                    for item_ in results.pop():
+                        yield item_
+            while results:
+                for item_ in results.pop():
+                    yield item_
+            completed = True
+        finally:
+            if completed:
+                pool.close()
+            else:
+                pool.terminate()
+            pool.join()
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import
+from __future__ import unicode_literals
+
+from operator import methodcaller
+import io
+import os
+import sys
+
+try:
+    import xml.etree.cElementTree as ElementTree
+except ImportError:
+    import xml.etree.ElementTree as ElementTree
+
+from six import string_types
+
+from transmogrifier.blueprints import Blueprint
+from transmogrifier.blueprints.data import BLOCK_SIZE
+from transmogrifier.checkpoint import get_checkpoint
+from transmogrifier.compression import DecompressingReader
+from transmogrifier.compression import get_compression
+from transmogrifier.utils import get_lines
+
+
+def get_local_name(tag):
+    """Return tag or attribute name without its namespace"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_xml_path(path, namespaces=None):
+    """Return absolute flag and steps of a simple XML path
+
+    Paths starting with ``/`` are matched from the root element and other
+    paths, also ``//tag``, against the innermost elements. Steps are tag
+    names, ``prefix:tag`` names with prefixes from namespaces, Clark
+    notation ``{uri}tag`` names or ``*`` wildcards. Tag names without a
+    namespace match elements in any namespace.
+
+    """
+    path = path.strip()
+    absolute = path.startswith('/') and not path.startswith('//')
+    steps = []
+    for step in path.strip('/').split('/'):
+        if ':' in step and not step.startswith('{'):
+            prefix, step = step.split(':', 1)
+            step = '{{{0:s}}}{1:s}'.format((namespaces or {})[prefix], step)
+        steps.append(step)
+    return absolute, steps
+
+
+def match_xml_path(absolute, steps, tags):
+    """Return True when the stack of open tags matches the path"""
+    if len(tags) < len(steps) or absolute and len(tags) != len(steps):
+        return False
+    for step, tag in zip(steps, tags[-len(steps):]):
+        if step == '*' or step == tag:
+            continue
+        if step.startswith('{') or step != get_local_name(tag):
+            return False
+    return True
+
+
+def get_xml_text(element):
+    if len(element):
+        return ''.join(element.itertext()).strip()
+    return (element.text or '').strip()
+
+
+def xml_to_mapping(element, names):
+    """Return mapping of the attributes and the child element texts of
+    the element keyed by their local names cached in names
+    """
+    def local_name(tag):
+        name = names.get(tag)
+        if name is None:
+            name = names[tag] = get_local_name(tag)
+        return name
+
+    item = {'_tag': local_name(element.tag)}
+    text = (element.text or '').strip()
+    if text:
+        item['_text'] = text
+    for key, value in element.attrib.items():
+        item[local_name(key)] = value
+    for child in element:
+        if not isinstance(child.tag, string_types):
+            continue  # comments and processing instructions
+        key = local_name(child.tag)
+        value = get_xml_text(child)
+        if key not in item:
+            item[key] = value
+        elif isinstance(item[key], list):
+            item[key].append(value)
+        else:
+            item[key] = [item[key], value]
+    return item
+
+
+class XMLSource(Blueprint):
+    def __iter__(self):
+        for item in self.previous:
+            yield item
+
+        path = self.options.get('filename', 'input.xml').strip()
+        compression = get_compression(path, self.options.get('compression'))
+        namespaces = dict(
+            map(methodcaller('strip'), line.split(None, 1))
+            for line in get_lines(self.options.get('namespaces')))
+        absolute, steps = parse_xml_path(
+            self.options.get('path', '/*/*'), namespaces)
+
+        if path != '-' and not os.path.isabs(path):
+            path = os.path.join(os.getcwd(), path)
+
+        checkpoint = get_checkpoint(self.transmogrifier)
+        skip = checkpoint and checkpoint.position(self.name) or 0
+
+        if path == '-':
+            fp = getattr(sys.stdin, 'buffer', sys.stdin)
+        else:
+            fp = open(path, 'rb')
+        if compression is not None:
+            fp = io.BufferedReader(DecompressingReader(
+                fp, compression, closefd=path != '-'), BLOCK_SIZE)
+
+        tags = []
+        elements = []
+        matches = []
+        matched_paths = {}
+        names = {}
+        number = 0
+        open_matches = 0
+        try:
+            for event, element in ElementTree.iterparse(
+                    fp, events=('start', 'end')):
+                if event == 'start':
+                    tags.append(element.tag)
+                    elements.append(element)
+                    key = tuple(tags if absolute else tags[-len(steps):])
+                    matched = matched_paths.get(key)
+                    if matched is None:
+                        matched = matched_paths[key] = match_xml_path(
+                            absolute, steps, tags)
+                    matches.append(matched)
+                    open_matches += matched
+                    continue
+
+                tags.pop()
+                elements.pop()
+                matched = matches.pop()
+                if matched:
+                    open_matches -= 1
+                    number += 1
+                    if number > skip:
+                        item = xml_to_mapping(element, names)
+                        if checkpoint is not None:
+                            checkpoint.register(self.name, item, number)
+                        yield item
+
+                # Drop completed elements, which are not part of an open
+                # matching element, to keep memory use flat
+                if elements and not open_matches:
+                    element.clear()
+                    elements[-1].remove(element)
+        finally:
+            if path != '-' or compression is not None:
+                fp.close()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from collections import OrderedDict
+import atexit
+import json
+import logging
+import os
+import threading
+
+from transmogrifier.utils import apply_overrides
+from transmogrifier.utils import copy_config
+from transmogrifier.utils import get_configuration_file
+from transmogrifier.utils import resolve_config
+
+logger = logging.getLogger('transmogrifier')
+
+
+def get_signature(path):
+    """Return modification time and size of the file or None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime, stat.st_size]
+
+
+class ConfigurationCache(object):
+    """Cache of resolved configurations
+
+    Configurations are cached by their id and overrides. A cached
+    configuration is valid as long as the ids of the configurations in its
+    include closure still refer to the same files and none of the files has
+    been modified. At most ``size`` configurations are kept, and the least
+    recently used ones are evicted first.
+
+    With ``path``, the cache is also persisted into the given JSON file, so
+    that configurations resolved by earlier processes are not parsed again.
+    Changes are written by ``flush``, which is called at the end of each
+    pipeline run and at exit.
+
+    """
+    def __init__(self, path=None, size=100):
+        self.path = path
+        self.size = size
+        self.entries = OrderedDict()
+        self.loaded = False
+        self.changed = False
+        self.registered = False
+        self.lock = threading.Lock()
+
+    def clear(self):
+        self.entries = OrderedDict()
+        self.loaded = False
+        self.changed = False
+
+    def get_key(self, configuration_id, overrides):
+        return json.dumps([configuration_id, overrides], sort_keys=True)
+
+    def is_valid(self, entry):
+        for configuration_id, path, signature in entry['sources']:
+            try:
+                if get_configuration_file(configuration_id) != path:
+                    return False
+            except (KeyError, ImportError):
+                return False
+            if get_signature(path) != signature:
+                return False
+        return True
+
+    def read(self):
+        self.loaded = True
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path) as fp:
+                entries = json.load(fp)
+        except ValueError:
+            logger.warning('Ignoring invalid configuration cache {0:s}'.format(
+                self.path))
+            return
+        # Entries are stored from the least to the most recently used
+        for key, entry in entries.items():
+            self.entries.setdefault(key, entry)
+        self.evict()
+
+    def evict(self):
+        while len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def flush(self):
+        """Write the cache into its file, if it has been changed"""
+        with self.lock:
+            if self.path and self.changed:
+                self.write()
+                self.changed = False
+
+    def write(self):
+        tmp = '{0:s}.{1:d}.tmp'.format(self.path, os.getpid())
+        with open(tmp, 'w') as fp:
+            json.dump(self.entries, fp)
+        if hasattr(os, 'replace'):
+            os.replace(tmp, self.path)
+        else:
+            os.rename(tmp, self.path)
+
+    def load(self, configuration_id, **overrides):
+        """Return resolved configuration with the given overrides"""
+        key = self.get_key(configuration_id, overrides)
+        if not self.loaded and self.path:
+            with self.lock:
+                if not self.loaded:
+                    self.read()
+
+        entry = self.entries.get(key)
+        if entry is not None and self.is_valid(entry):
+            with self.lock:
+                if self.entries.pop(key, None) is not None:
+                    self.entries[key] = entry  # mark as recently used
+            return copy_config(entry['config'])
+
+        sources = {}
+        config = resolve_config(configuration_id, sources=sources)
+        apply_overrides(config, overrides)
+        entry = {
+            'sources': [[source_id, path, get_signature(path)]
+                        for source_id, path in sources.items()],
+            'config': copy_config(config),
+        }
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = entry
+            self.evict()
+            self.changed = True
+            if self.path and not self.registered:
+                atexit.register(self.flush)
+                self.registered = True
+        return config
+
+
+configuration_cache = ConfigurationCache()
+
+
+try:
+    from zope.testing.cleanup import addCleanUp
+except ImportError:
+    addCleanUp = lambda x: None  # noqa
+else:
+    addCleanUp(configuration_cache.clear)
+    del addCleanUp
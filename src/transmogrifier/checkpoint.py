@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+import threading
+
+from collections import OrderedDict
+
+
+logger = logging.getLogger('transmogrifier')
+
+
+class Checkpoint(object):
+    """Persistent progress cursor of a transmogrifier run
+
+    Sources ``register`` each item they yield together with their position
+    after that item. When the transmogrifier has drained an item from the
+    last section, it is marked ``processed`` and the positions registered
+    up to that item become the positions to resume from. Sources ask for
+    that position on resume and skip the items already processed.
+
+    Registered items are kept referenced until they are processed, so that
+    they are recognized by their identity without changing them. Sections
+    must keep the order of the items, because an item processed means that
+    all the items registered before it have been processed or filtered out.
+    Items replaced by later sections are not recognized and advance the
+    positions only with the next recognized item.
+
+    The state is written into a JSON file every ``interval`` processed items
+    and when the run fails. The file is removed after a successful run.
+    While ``resuming`` from a saved state, sinks append to their output.
+    Sinks writing in transactions ``hold`` the checkpoint with a function
+    committing their transaction, which is called before the state is saved.
+    While it is held, a failed run keeps the state saved after the last
+    commit, because the rows of the items processed since then are rolled
+    back.
+    Sources may register items on other threads than the one marking them
+    processed, so the state is guarded by a lock.
+
+    """
+    def __init__(self, path, interval=1000, key=None, resume=False):
+        self.path = path
+        self.interval = interval
+        self.key = key
+        self.count = 0
+        self.last_key = None
+        self.positions = {}
+        self.resumed = {}
+        self.resuming = False
+
+        self._lock = threading.Lock()
+        self._commits = []
+        self._seq = 0
+        self._seqs = {}
+        self._pending = OrderedDict()
+        self._max_pending = max(interval * 10, 10000)
+
+        if resume and os.path.isfile(path):
+            with open(path) as fp:
+                state = json.load(fp)
+            self.count = state.get('count', 0)
+            self.last_key = state.get('key')
+            self.positions = dict(state.get('positions', {}))
+            self.resumed = dict(self.positions)
+            self.resuming = True
+            logger.info('Resuming from {0:s} after {1:d} items'.format(
+                path, self.count))
+
+    def position(self, section):
+        """Return the position to resume the given source section from"""
+        return self.resumed.get(section)
+
+    def register(self, section, item, position):
+        """Register position of a source section after the yielded item"""
+        with self._lock:
+            self._seq += 1
+            self._pending[self._seq] = (section, position, item)
+            self._seqs.setdefault(id(item), self._seq)
+            # Items filtered out for long are never processed
+            while len(self._pending) > self._max_pending:
+                self._pop()
+
+    def _pop(self):
+        seq, (section, position, item) = self._pending.popitem(last=False)
+        if self._seqs.get(id(item)) == seq:
+            del self._seqs[id(item)]
+        return section, position
+
+    def processed(self, item):
+        """Mark item processed by the whole pipeline"""
+        with self._lock:
+            self.count += 1
+            seq = self._seqs.get(id(item))
+            while self._pending and seq is not None:
+                if next(iter(self._pending)) > seq:
+                    break
+                section, position = self._pop()
+                self.positions[section] = position
+            if self.key is not None:
+                get = getattr(item, 'get', None)
+                if get is not None:
+                    self.last_key = get(self.key)
+            if self.count % self.interval == 0:
+                self.save()
+
+    def hold(self, commit):
+        """Call commit function before saving the state until released"""
+        with self._lock:
+            self._commits.append(commit)
+
+    def release(self, commit):
+        with self._lock:
+            self._commits.remove(commit)
+
+    def save(self):
+        for commit in self._commits:
+            commit()
+        state = {
+            'count': self.count,
+            'key': self.last_key,
+            'positions': self.positions,
+        }
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump(state, fp)
+        if hasattr(os, 'replace'):
+            os.replace(tmp, self.path)
+        else:
+            os.rename(tmp, self.path)
+
+    def close(self, completed):
+        if completed:
+            if os.path.isfile(self.path):
+                os.remove(self.path)
+        elif self._commits:
+            logger.info('Kept checkpoint {0:s} of the last commit'.format(
+                self.path))
+        else:
+            with self._lock:
+                self.save()
+            logger.info('Saved checkpoint {0:s} after {1:d} items'.format(
+                self.path, self.count))
+
+
+def get_checkpoint(transmogrifier):
+    """Return the checkpoint of the current run or None"""
+    return getattr(transmogrifier, 'checkpoint', None)
+
+
+def is_resuming(transmogrifier):
+    """Return True when the current run resumes from a saved checkpoint"""
+    checkpoint = get_checkpoint(transmogrifier)
+    return checkpoint is not None and checkpoint.resuming
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+try:
+    from importlib.util import find_spec
+except ImportError:  # Python 2
+    from pkgutil import find_loader as find_spec
+
+
+def is_installed(name):
+    """Return True when the named module can be imported
+
+    Finding the module is much cheaper than looking up the installed
+    distributions, which matters for probes run at import time.
+
+    """
+    try:
+        return find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def get_version(name):
+    """Return version of the named installed distribution or None"""
+    try:
+        from importlib.metadata import PackageNotFoundError
+        from importlib.metadata import version
+    except ImportError:  # Python < 3.8
+        import pkg_resources
+        try:
+            return pkg_resources.get_distribution(name).version
+        except pkg_resources.DistributionNotFound:
+            return None
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return None
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import bz2
+import io
+import os
+import sys
+import threading
+import zlib
+
+from six import reraise
+from six.moves.queue import Full
+from six.moves.queue import Queue
+
+try:
+    import lzma
+except ImportError:  # Python 2 without backports.lzma
+    lzma = None
+
+BLOCK_SIZE = 1024 * 1024
+
+EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'lzma',
+    '.lzma': 'lzma',
+}
+
+ALIASES = {
+    'gz': 'gzip',
+    'bzip2': 'bz2',
+    'xz': 'lzma',
+}
+
+_DATA = 'data'
+_FLUSH = 'flush'
+_END = 'end'
+_ERROR = 'error'
+
+
+def _check_lzma():
+    if lzma is None:
+        raise ValueError('lzma compression is not available')
+
+
+def get_compressor(compression):
+    if compression == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif compression == 'bz2':
+        return bz2.BZ2Compressor()
+    _check_lzma()
+    return lzma.LZMACompressor()
+
+
+def get_decompressor(compression):
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif compression == 'bz2':
+        return bz2.BZ2Decompressor()
+    _check_lzma()
+    return lzma.LZMADecompressor()
+
+
+def iter_decompressed(decompressor, data, size=BLOCK_SIZE):
+    """Yield chunks of at most size bytes decompressed from the data
+
+    zlib keeps the input beyond the output limit in ``unconsumed_tail``,
+    while bz2 and lzma keep it buffered until they need more input. Python 2
+    bz2 decompressors have no output limit.
+
+    """
+    if not hasattr(decompressor, 'unconsumed_tail') and \
+            not hasattr(decompressor, 'needs_input'):
+        yield decompressor.decompress(data)
+        return
+    while True:
+        chunk = decompressor.decompress(data, size)
+        if chunk:
+            yield chunk
+        if getattr(decompressor, 'eof', False):
+            return
+        data = getattr(decompressor, 'unconsumed_tail', b'')
+        if not data and len(chunk) < size and \
+                getattr(decompressor, 'needs_input', True):
+            return
+
+
+def get_compression(path, compression=None):
+    """Return name of the compression of the given file or None
+
+    The compression is given explicitly as ``gzip``, ``bz2``, ``lzma`` or
+    ``none``, or detected from the file extension when not given or
+    ``auto``.
+
+    """
+    compression = (compression or 'auto').strip().lower()
+    compression = ALIASES.get(compression, compression)
+    if compression == 'auto':
+        compression = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    elif compression == 'none':
+        compression = None
+    elif compression not in ['gzip', 'bz2', 'lzma']:
+        raise ValueError(
+            'Unknown compression: {0:s}'.format(compression))
+    if compression == 'lzma':
+        _check_lzma()
+    return compression
+
+
+class _HelperThreadIO(io.RawIOBase):
+    """Raw stream, which exchanges data with a helper thread through
+    a bounded queue
+    """
+    def __init__(self, fp, closefd=True, depth=4):
+        super(_HelperThreadIO, self).__init__()
+        self.fp = fp
+        self.closefd = closefd
+        self.queue = Queue(maxsize=depth)
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, value):
+        while not self.stop.is_set():
+            try:
+                self.queue.put(value, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def fileno(self):
+        return self.fp.fileno()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.stop.set()
+            self.thread.join()
+        finally:
+            if self.closefd:
+                self.fp.close()
+            super(_HelperThreadIO, self).close()
+
+
+class DecompressingReader(_HelperThreadIO):
+    """Raw binary stream of data decompressed from the given binary file on
+    a helper thread
+
+    Concatenated compressed streams are read as a single stream. Data is
+    decompressed in chunks of at most ``BLOCK_SIZE`` bytes, so highly
+    compressed files never expand into memory at once.
+
+    """
+    def __init__(self, fp, compression, closefd=True, depth=4):
+        self.compression = compression
+        get_decompressor(compression)  # fail early when not available
+        self.view = memoryview(b'')
+        self.eof = False
+        super(DecompressingReader, self).__init__(fp, closefd, depth)
+
+    def readable(self):
+        return True
+
+    def run(self):
+        try:
+            decompressor = get_decompressor(self.compression)
+            while True:
+                data = self.fp.read(BLOCK_SIZE)
+                if not data:
+                    break
+                while data:
+                    for chunk in iter_decompressed(decompressor, data):
+                        if chunk and not self.put((_DATA, chunk)):
+                            return
+                    data = decompressor.unused_data
+                    if data:
+                        decompressor = get_decompressor(self.compression)
+            if not getattr(decompressor, 'eof', True):
+                raise EOFError('Compressed file ended before the '
+                               'end-of-stream marker was reached')
+            self.put((_END, None))
+        except BaseException:
+            self.put((_ERROR, sys.exc_info()))
+
+    def readinto(self, b):
+        while not len(self.view):
+            if self.eof:
+                return 0
+            marker, value = self.queue.get()
+            if marker == _END:
+                self.eof = True
+                return 0
+            elif marker == _ERROR:
+                self.eof = True
+                reraise(*value)
+            self.view = memoryview(value)
+        size = min(len(b), len(self.view))
+        b[:size] = self.view[:size]
+        self.view = self.view[size:]
+        return size
+
+
+class CompressingWriter(_HelperThreadIO):
+    """Raw binary stream, which compresses written data into the given
+    binary file on a helper thread
+
+    Written data is collected into blocks of ``buffer_size`` bytes before it
+    is passed to the helper thread. Flushing waits until the data written so
+    far has been compressed and written into the file. The compressed stream
+    is completed when the stream is closed.
+
+    """
+    def __init__(self, fp, compression, buffer_size=BLOCK_SIZE,
+                 closefd=True, depth=4):
+        self.compression = compression
+        get_compressor(compression)  # fail early when not available
+        self.buffer_size = buffer_size
+        self.pending = []
+        self.pending_size = 0
+        self.error = None
+        super(CompressingWriter, self).__init__(fp, closefd, depth)
+
+    def writable(self):
+        return True
+
+    def run(self):
+        try:
+            compressor = get_compressor(self.compression)
+            while True:
+                marker, value = self.queue.get()
+                if marker == _DATA:
+                    data = compressor.compress(value)
+                    if data:
+                        self.fp.write(data)
+                elif marker == _FLUSH:
+                    self.fp.flush()
+                    value.set()
+                else:
+                    self.fp.write(compressor.flush())
+                    self.fp.flush()
+                    break
+        except BaseException:
+            self.error = sys.exc_info()
+            self.stop.set()
+
+    def _check(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            reraise(*error)
+
+    def _put_pending(self):
+        if self.pending:
+            data = b''.join(self.pending)
+            self.pending = []
+            self.pending_size = 0
+            self.put((_DATA, data))
+        self._check()
+
+    def write(self, b):
+        self._check()
+        data = bytes(b)
+        self.pending.append(data)
+        self.pending_size += len(data)
+        if self.pending_size >= self.buffer_size:
+            self._put_pending()
+        return len(data)
+
+    def flush(self):
+        if self.closed or self.stop.is_set():
+            self._check()
+            return
+        self._put_pending()
+        flushed = threading.Event()
+        if self.put((_FLUSH, flushed)):
+            while not flushed.wait(0.1) and self.error is None:
+                pass
+        self._check()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._put_pending()
+            self.put((_END, None))
+            self.thread.join()
+            self._check()
+        finally:
+            super(CompressingWriter, self).close()
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
+import ast
+
 from transmogrifier.expression import Expression
+from transmogrifier.expression import split_prefix
 
 
 class Condition(Expression):
@@ -10,3 +13,55 @@ class Condition(Expression):
     """
     def __call__(self, item, **extras):
         return bool(super(Condition, self).__call__(item, **extras))
+
+    def batch(self, items, extras=None):
+        return [bool(result) for result in
+                super(Condition, self).batch(items, extras)]
+
+
+class ConstantCondition(object):
+    """A condition with a statically known result"""
+
+    def __init__(self, value):
+        self.value = bool(value)
+
+    def __call__(self, item, **extras):
+        return self.value
+
+    def batch(self, items, extras=None):
+        return [self.value] * len(items)
+
+
+ALWAYS = ConstantCondition(True)
+NEVER = ConstantCondition(False)
+
+
+def get_constant(expression):
+    """Return the static truth value of expression or None if not constant
+    """
+    prefix, source = split_prefix(expression)
+    if prefix == 'python':
+        try:
+            return bool(ast.literal_eval(source.strip()))
+        except (ValueError, SyntaxError, TypeError):
+            return None
+    elif prefix == 'string' and '$' not in source:
+        return bool(source)
+    return None
+
+
+def get_condition(expression, transmogrifier, name, options, **extras):
+    """Return condition for expression with constant conditions folded
+
+    Missing or statically constant conditions are replaced with ALWAYS or
+    NEVER, which callers may short-circuit in their loops.
+
+    """
+    if not (expression or '').strip():
+        return ALWAYS
+    constant = get_constant(expression)
+    if constant is True:
+        return ALWAYS
+    elif constant is False:
+        return NEVER
+    return Condition(expression, transmogrifier, name, options, **extras)
@@ -4,13 +4,20 @@ from __future__ import unicode_literals
 import functools
 from logging import getLogger
 from logging import DEBUG
+from operator import itemgetter
 import sys
+from types import CodeType
+
+from collections import OrderedDict
 
 from chameleon import tales
 from chameleon.astutil import Builtin
 
+from chameleon.compiler import Compiler
 from chameleon.compiler import ExpressionEngine
-from chameleon.compiler import ExpressionEvaluator
+from chameleon.nodes import Assignment
+from chameleon.nodes import Context
+from chameleon.nodes import Module
 from chameleon.tales import ExpressionParser
 from chameleon.tales import match_prefix
 
@@ -25,6 +32,114 @@ except ImportError:
     HAS_Z3C_PT = False
 
 DEFAULT_EXPRESSION_TYPE = 'python'
+DEFAULT_ENGINE = 'chameleon'
+ENGINES = ('chameleon', 'native')
+
+if HAS_Z3C_PT:
+    EXPRESSION_TYPES = {
+        'python': expressions.PythonExpr,
+        'string': tales.StringExpr,
+        'not': tales.NotExpr,
+        'exists': expressions.ExistsExpr,
+        'path': expressions.PathExpr,
+        'provider': expressions.ProviderExpr,
+        'nocall': expressions.NocallExpr,
+    }
+else:
+    EXPRESSION_TYPES = {
+        'python': tales.PythonExpr,
+        'string': tales.StringExpr,
+        'not': tales.NotExpr,
+        'exists': tales.ExistsExpr,
+        'import': tales.ImportExpr,
+        'structure': tales.StructureExpr,
+    }
+
+# Process-wide cache of compiled expressions
+_compiled = {}
+
+
+def split_prefix(expression):
+    """Return (prefix, source) for a TALES expression string"""
+    m = match_prefix(expression)
+    if m is not None:
+        return m.group(1), expression[m.end():]
+    else:
+        return DEFAULT_EXPRESSION_TYPE, expression
+
+
+def compile_expression(prefix, source, expression_types=None, names=()):
+    """Compile TALES expression into a ready evaluate function
+
+    The returned function is called with ``(econtext, rcontext, *values)``,
+    where values match the given builtin ``names``, and it stores its result
+    into ``econtext['_result']``. Compiled functions are cached process-wide
+    by prefix, source, expression type table and builtin names.
+
+    """
+    if expression_types is None:
+        expression_types = EXPRESSION_TYPES
+    key = (prefix, source,
+           tuple(sorted(expression_types.items(), key=itemgetter(0))),
+           tuple(names))
+
+    try:
+        return _compiled[key]
+    except KeyError:
+        pass
+
+    parser = ExpressionParser(expression_types, DEFAULT_EXPRESSION_TYPE)
+    engine = functools.partial(ExpressionEngine, parser,
+                               default_marker=Builtin('False'))
+    assignment = Assignment(['_result'], '%s:%s' % (prefix, source), True)
+    module = Module('evaluate', Context(assignment))
+    compiler = Compiler(engine, module, '<string>', source,
+                        ('econtext', 'rcontext') + tuple(names))
+    env = {}
+    exec(compiler.code, env)
+    evaluate = _compiled[key] = env['evaluate']
+    return evaluate
+
+
+def compile_native(source):
+    """Compile plain python expression into a cached code object
+
+    Returns None when the source is not a valid standalone python expression,
+    which lets the caller fall back to Chameleon.
+
+    """
+    key = ('native', source)
+
+    try:
+        return _compiled[key]
+    except KeyError:
+        pass
+
+    try:
+        code = compile(source.strip(), '<expression>', 'eval')
+    except SyntaxError:
+        code = None
+    _compiled[key] = code
+    return code
+
+
+def get_engine(transmogrifier):
+    """Return the expression engine configured for the transmogrifier
+
+    The engine is read from ``expression_engine`` option of the main
+    ``[transmogrifier]`` section and is either ``chameleon`` (the default)
+    or ``native``, which evaluates plain python expressions without
+    Chameleon.
+
+    """
+    try:
+        options = transmogrifier['transmogrifier']
+    except (KeyError, TypeError):
+        return DEFAULT_ENGINE
+    engine = (options.get('expression_engine') or DEFAULT_ENGINE).strip()
+    if engine not in ENGINES:
+        raise ValueError('Unknown expression engine: {0:s}'.format(engine))
+    return engine
 
 
 class Expression(object):
@@ -33,6 +148,8 @@ class Expression(object):
     Evaluate the expression with a transmogrifier context.
 
     """
+    expression_types = EXPRESSION_TYPES
+
     def __init__(self, expression, transmogrifier, name, options, **extras):
         self.expression = expression
         self.transmogrifier = transmogrifier
@@ -40,30 +157,6 @@ class Expression(object):
         self.options = options
         self.extras = extras
 
-        if HAS_Z3C_PT:
-            self.expression_types = {
-                'python': expressions.PythonExpr,
-                'string': tales.StringExpr,
-                'not': tales.NotExpr,
-                'exists': expressions.ExistsExpr,
-                'path': expressions.PathExpr,
-                'provider': expressions.ProviderExpr,
-                'nocall': expressions.NocallExpr,
-            }
-        else:
-            self.expression_types = {
-                'python': tales.PythonExpr,
-                'string': tales.StringExpr,
-                'not': tales.NotExpr,
-                'exists': tales.ExistsExpr,
-                'import': tales.ImportExpr,
-                'structure': tales.StructureExpr,
-            }
-
-        parser = ExpressionParser(self.expression_types,
-                                  DEFAULT_EXPRESSION_TYPE)
-        engine = functools.partial(ExpressionEngine, parser,
-                                   default_marker=Builtin('False'))
         context = {
             'context': transmogrifier.context,
             'decode': lambda x: x.decode('utf-8'),
@@ -74,29 +167,131 @@ class Expression(object):
             'transmogrifier': transmogrifier,
         }
         context.update(extras)
-        self.evaluator = ExpressionEvaluator(engine, context)
+        names, self.builtins = zip(*context.items())
+
+        prefix, source = split_prefix(self.expression)
+        self.code = self.evaluate = None
+        if prefix == 'python' and get_engine(transmogrifier) == 'native':
+            self.code = compile_native(source)
+        if self.code is not None:
+            self.namespace = context
+            if any(isinstance(const, CodeType)
+                   for const in self.code.co_consts):
+                # Nested scopes only see globals and require a full copy
+                self._evaluate = self._evaluate_native_nested
+            else:
+                self._evaluate = self._evaluate_native
+        else:
+            self.evaluate = compile_expression(
+                prefix, source, self.expression_types, names)
+            self._evaluate = self._evaluate_chameleon
 
         logger_base = getattr(
             transmogrifier, 'configuration_id', 'transmogrifier')
         self.logger = getLogger(logger_base + '.' + name)
 
-    def __call__(self, item, **extras):
-        context = {}
-        context.update(extras)
-        context.update({'item': item})
+    def _evaluate_chameleon(self, item, extras):
+        extras['item'] = item
+        self.evaluate(extras, {}, *self.builtins)
+        return extras['_result']
 
-        m = match_prefix(self.expression)
-        if m is not None:
-            prefix = m.group(1)
-            expr = self.expression[m.end():]
-        else:
-            prefix = DEFAULT_EXPRESSION_TYPE
-            expr = self.expression
+    def _evaluate_native(self, item, extras):
+        extras['item'] = item
+        return eval(self.code, self.namespace, extras)
 
-        result = self.evaluator(context, {}, prefix, expr)
+    def _evaluate_native_nested(self, item, extras):
+        namespace = self.namespace.copy()
+        namespace.update(extras)
+        namespace['item'] = item
+        return eval(self.code, namespace)
+
+    def __call__(self, item, **extras):
+        result = self._evaluate(item, extras)
 
         if self.logger.isEnabledFor(DEBUG):
             formatted = pformat_msg(result)
             self.logger.debug(
                 'Expression returned: {0:s}'.format(formatted))
         return result
+
+    def batch(self, items, extras=None):
+        """Evaluate the expression for a list of items
+
+        Optional ``extras`` is a sequence of extra names for each item.
+        Returns a list of results in the order of the given items.
+
+        """
+        if extras is None:
+            extras = [{}] * len(items)
+
+        if self.evaluate is not None:
+            evaluate = self.evaluate
+            builtins = self.builtins
+            rcontext = {}
+            results = []
+            for item, extras_ in zip(items, extras):
+                context = dict(extras_)
+                context['item'] = item
+                evaluate(context, rcontext, *builtins)
+                results.append(context['_result'])
+        else:
+            evaluate = self._evaluate
+            results = [evaluate(item, dict(extras_))
+                       for item, extras_ in zip(items, extras)]
+
+        if self.logger.isEnabledFor(DEBUG):
+            for result in results:
+                formatted = pformat_msg(result)
+                self.logger.debug(
+                    'Expression returned: {0:s}'.format(formatted))
+        return results
+
+
+class MemoizedExpression(object):
+    """A transmogrifier expression with memoized results
+
+    Results are cached in a bounded LRU cache keyed by the values of the
+    given item keys. Items with unhashable key values are always evaluated.
+
+    """
+    def __init__(self, expression, keys, size=1000):
+        self.expression = expression
+        self.keys = tuple(keys)
+        self.size = size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, item):
+        get = getattr(item, 'get', None)
+        if get is None:
+            return (None,) * len(self.keys)
+        return tuple(get(key) for key in self.keys)
+
+    def __call__(self, item, **extras):
+        key = self._key(item)
+        try:
+            result = self.cache.pop(key)
+        except KeyError:
+            pass
+        except TypeError:  # unhashable
+            return self.expression(item, **extras)
+        else:
+            self.hits += 1
+            self.cache[key] = result  # mark as recently used
+            return result
+
+        self.misses += 1
+        result = self.cache[key] = self.expression(item, **extras)
+        if len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+        return result
+
+    def batch(self, items, extras=None):
+        if extras is None:
+            extras = [{}] * len(items)
+        return [self(item, **extras_) for item, extras_ in zip(items, extras)]
+
+    def cache_info(self):
+        return dict(hits=self.hits, misses=self.misses,
+                    size=len(self.cache), maxsize=self.size)
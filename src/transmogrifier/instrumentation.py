@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from bisect import bisect_left
+from timeit import default_timer
+import logging
+import threading
+
+
+logger = logging.getLogger('transmogrifier')
+
+# Latency histogram bucket upper bounds in seconds (1us .. ~17min)
+BUCKETS = tuple(2 ** i / 1000000. for i in range(31))
+
+_MISSING = object()
+
+
+class SectionStatistics(object):
+    """Counters and latency histogram of a single pipeline section
+
+    ``time`` is the wall time spent in the section itself, excluding the
+    time spent in its upstream sections. Latency is recorded for every
+    item produced by the section, excluding upstream time.
+
+    """
+    def __init__(self, name, blueprint):
+        self.name = name
+        self.blueprint = blueprint
+        self.items_in = 0
+        self.items_out = 0
+        self.time = 0.
+        self.histogram = [0] * (len(BUCKETS) + 1)
+        self.max_latency = 0.
+
+    def record(self, latency):
+        self.items_out += 1
+        self.histogram[bisect_left(BUCKETS, latency)] += 1
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+    def percentile(self, percent):
+        """Return upper bound of latency for given percent of items"""
+        total = sum(self.histogram)
+        if not total:
+            return 0.
+        threshold = total * percent / 100.
+        count = 0
+        for bucket, value in enumerate(self.histogram):
+            count += value
+            if count >= threshold:
+                if bucket < len(BUCKETS):
+                    return min(BUCKETS[bucket], self.max_latency)
+                return self.max_latency
+        return self.max_latency
+
+    def summary(self):
+        return dict(
+            name=self.name,
+            blueprint=self.blueprint,
+            items_in=self.items_in,
+            items_out=self.items_out,
+            time=self.time,
+            p50=self.percentile(50),
+            p90=self.percentile(90),
+            p99=self.percentile(99),
+            max=self.max_latency,
+        )
+
+
+class InstrumentedSection(object):
+    """Iterator wrapper, which records statistics of the wrapped section
+
+    Items are counted into ``items_in`` of the ``consumer`` statistics, which
+    are set when the following section is instrumented, or else of the
+    section calling this one on the same thread.
+
+    """
+    def __init__(self, recorder, statistics, section):
+        self.recorder = recorder
+        self.statistics = statistics
+        self.iterator = iter(section)
+        self.consumer = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        stack = self.recorder.local.stack
+        frame = [self.statistics, 0.]
+        stack.append(frame)
+        item = _MISSING
+        start = default_timer()
+        try:
+            item = next(self.iterator)
+        finally:
+            elapsed = default_timer() - start
+            stack.pop()
+            latency = elapsed - frame[1]
+            consumer = self.consumer
+            if stack:
+                stack[-1][1] += elapsed
+                consumer = consumer or stack[-1][0]
+            with self.recorder.lock:
+                self.statistics.time += latency
+                if item is not _MISSING:
+                    self.statistics.record(latency)
+                    if consumer is not None:
+                        consumer.items_in += 1
+        return item
+
+    next = __next__
+
+    def close(self):
+        close = getattr(self.iterator, 'close', None)
+        if close is not None:
+            close()
+
+
+class _Local(threading.local):
+    """Stack of the sections being iterated by the current thread"""
+
+    def __init__(self):
+        self.stack = []
+
+
+class Recorder(object):
+    """Collect per section statistics of a transmogrifier run
+
+    Sections may be iterated by other threads, like the one of
+    ``transmogrifier.prefetch``, so every thread has its own stack of the
+    sections it is iterating, and the statistics are updated under a lock.
+    Sections constructed more than once, like the sub-pipelines of
+    ``transmogrifier.threaded``, share the statistics of their name.
+
+    """
+    def __init__(self):
+        self.sections = []
+        self.statistics = {}
+        self.local = _Local()
+        self.lock = threading.Lock()
+        self.start = default_timer()
+        self.time = 0.
+
+    def instrument(self, name, blueprint, section):
+        with self.lock:
+            statistics = self.statistics.get((name, blueprint))
+            if statistics is None:
+                statistics = SectionStatistics(name, blueprint)
+                self.statistics[(name, blueprint)] = statistics
+                self.sections.append(statistics)
+        previous = getattr(section, 'previous', None)
+        if isinstance(previous, InstrumentedSection):
+            previous.consumer = statistics
+        return InstrumentedSection(self, statistics, section)
+
+    def stop(self):
+        self.time = default_timer() - self.start
+
+    def summary(self):
+        """Return list of section statistics dictionaries in pipeline order
+        """
+        return [statistics.summary() for statistics in self.sections]
+
+    def report(self, log=logger):
+        log.info('Transmogrifier run completed in {0:.3f}s'.format(self.time))
+        for summary in self.summary():
+            log.info(
+                '{name:s} ({blueprint:s}): {items_in:d} in, '
+                '{items_out:d} out, {time:.3f}s, '
+                'p50 {p50:.6f}s, p90 {p90:.6f}s, p99 {p99:.6f}s, '
+                'max {max:.6f}s'.format(**summary))
+
+
+def instrument(transmogrifier, name, blueprint, section):
+    """Wrap section with instrumentation when the transmogrifier has a
+    recorder, or return the section as such.
+    """
+    recorder = getattr(transmogrifier, 'recorder', None)
+    if recorder is None:
+        return section
+    return recorder.instrument(name, blueprint, section)
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
-import pkg_resources
 import zope.interface
 
+from transmogrifier.compat import is_installed
+
 
 # noinspection PyMethodParameters
 class ITransmogrifier(zope.interface.Interface):
@@ -18,6 +19,17 @@ class ITransmogrifier(zope.interface.Interface):
 
         """
 
+    def prepare(configuration_id, **overrides):
+        """Load the named pipeline configuration and return a plan
+
+        The plan is called with a context and optional per-run overrides to
+        execute the pipeline, and it may be executed any number of times.
+
+        """
+
+    def execute(plan, **overrides):
+        """Execute a prepared pipeline plan"""
+
     def __getitem__(section):
         """Retrieve a section from the pipeline configuration"""
 
@@ -55,10 +67,7 @@ class ISection(zope.interface.Interface):
 
 
 # BBB: Support collective.transmogrifier
-try:
-    pkg_resources.get_distribution('collective.transmogrifier')
+if is_installed('collective.transmogrifier'):
     from collective.transmogrifier.interfaces import ITransmogrifier  # noqa
     from collective.transmogrifier.interfaces import ISectionBlueprint  # noqa
     from collective.transmogrifier.interfaces import ISection  # noqa
-except pkg_resources.DistributionNotFound:
-    pass
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import codecs
+import json
+import re
+
+BLOCK_SIZE = 1024 * 1024
+
+WILDCARD = object()
+
+PATH_STEP = re.compile(r"""
+    \.(?P<wildcard>\*)
+  | \[(?P<wildcard_>\*)\]
+  | \[(?P<index>\d+)\]
+  | \[(?P<quote>['"])(?P<key>.*?)(?P=quote)\]
+  | \.(?P<key_>[^.\[]+)
+""", re.VERBOSE)
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+NUMBER = re.compile(r'[-+0-9.eE]*')
+STRING_END = re.compile(r'(?:[^"\\]|\\.)*"', re.DOTALL)
+CONTAINER_TOKEN = re.compile(r'["\[\]{}]')
+TOKEN_END = re.compile(r'[ \t\n\r,:"\[\]{}]')
+
+
+def parse_path(path):
+    """Return steps of a simple JSONPath expression like ``$.items[*]``
+
+    Steps are object keys, array indexes or ``WILDCARD`` matching every
+    member of an array or an object.
+
+    """
+    path = (path or '$').strip()
+    if path.startswith('$'):
+        path = path[1:]
+    steps = []
+    position = 0
+    while position < len(path):
+        match = PATH_STEP.match(path, position)
+        if match is None:
+            raise ValueError('Invalid JSON path: {0:s}'.format(path))
+        if match.group('wildcard') or match.group('wildcard_'):
+            steps.append(WILDCARD)
+        elif match.group('index') is not None:
+            steps.append(int(match.group('index')))
+        elif match.group('key') is not None:
+            steps.append(match.group('key'))
+        else:
+            steps.append(match.group('key_'))
+        position = match.end()
+    return steps
+
+
+class JSONStream(object):
+    """Incremental reader of values at a path of a JSON document
+
+    The document is read from a binary file in blocks of ``block_size``
+    bytes. Only the values selected by the path are decoded, the rest of the
+    document is skipped without decoding, so memory use is bounded by the
+    block size and the size of a single selected value.
+
+    """
+    def __init__(self, fp, encoding='utf-8', block_size=BLOCK_SIZE):
+        self.fp = fp
+        self.decoder = codecs.getincrementaldecoder(encoding)()
+        self.block_size = block_size
+        self.raw_decode = json.JSONDecoder().raw_decode
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read the next block into the buffer or return False at the end of
+        the file
+        """
+        if self.eof:
+            return False
+        data = self.fp.read(self.block_size)
+        text = self.decoder.decode(data, final=not data)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        if not data:
+            self.eof = True
+        return True
+
+    def error(self, message):
+        raise ValueError('{0:s} near: {1:s}'.format(
+            message, self.buffer[self.pos:self.pos + 20]))
+
+    def peek(self):
+        """Return the next non-whitespace character or None at the end"""
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return None
+
+    def expect(self, chars):
+        char = self.peek()
+        if char is None or char not in chars:
+            self.error('Expected {0:s}'.format(' or '.join(chars)))
+        self.pos += 1
+        return char
+
+    def decode(self):
+        """Decode the next value"""
+        char = self.peek()
+        if char is not None and char in '-0123456789':
+            # Numbers may continue in the next block, so read until the end
+            # of the number is in the buffer
+            while (NUMBER.match(self.buffer, self.pos).end() ==
+                   len(self.buffer) and self.fill()):
+                pass
+        while True:
+            try:
+                value, end = self.raw_decode(self.buffer, self.pos)
+            except ValueError as e:
+                if self.malformed(e) or not self.fill():
+                    raise
+                continue
+            self.pos = end
+            return value
+
+    def malformed(self, error):
+        """Return True when the token failing to decode ends in the buffer,
+        so reading more of the document would not fix it
+        """
+        # Python 2 errors have no position
+        pos = getattr(error, 'pos', None)
+        if pos is None or error.msg.startswith('Unterminated string'):
+            return False
+        return TOKEN_END.search(self.buffer, pos + 1) is not None
+
+    def skip(self):
+        """Skip the next value without decoding it"""
+        char = self.peek()
+        if char is None:
+            self.error('Unexpected end of document')
+        elif char not in '[{"':
+            self.decode()
+            return
+        depth = 0
+        while True:
+            match = CONTAINER_TOKEN.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self.fill():
+                    self.error('Unexpected end of document')
+                continue
+            self.pos = match.end()
+            char = match.group()
+            if char == '"':
+                while True:
+                    match = STRING_END.match(self.buffer, self.pos)
+                    if match is not None:
+                        break
+                    if not self.fill():
+                        self.error('Unterminated string')
+                self.pos = match.end()
+            elif char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+            if depth <= 0:
+                return
+
+    def members(self):
+        """Yield keys or indexes of the members of the next array or object
+        leaving the position at the start of each member value
+        """
+        char = self.expect('[{')
+        end = char == '[' and ']' or '}'
+        index = 0
+        if self.peek() == end:
+            self.pos += 1
+            return
+        while True:
+            if end == '}':
+                key = self.decode()
+                self.expect(':')
+                yield key
+            else:
+                yield index
+            index += 1
+            if self.expect(',' + end) == end:
+                return
+
+    def select(self, steps):
+        """Yield the values at the path of the given steps"""
+        if not steps:
+            yield self.decode()
+            return
+        step, steps = steps[0], steps[1:]
+        char = self.peek()
+        if char is None:
+            self.error('Unexpected end of document')
+        elif char not in '[{':
+            self.skip()
+            return
+        for key in self.members():
+            if step is WILDCARD or step == key:
+                for value in self.select(steps):
+                    yield value
+            else:
+                self.skip()
+
+
+def iter_path(fp, path='$[*]', encoding='utf-8', block_size=BLOCK_SIZE):
+    """Yield values at the given path of a JSON document read from
+    a binary file
+    """
+    stream = JSONStream(fp, encoding, block_size)
+    for value in stream.select(parse_path(path)):
+        yield value
+    if stream.peek() is not None:
+        stream.error('Extra data')
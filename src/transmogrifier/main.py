@@ -2,13 +2,17 @@
 """
 Usage: transmogrify <pipelines_and_overrides>...
                     [--overrides=overrides.cfg>]
+                    [--resume]
                     [--include=package_or_module>...]
                     [--include=package:filename>...]
                     [--context=<package.module.factory>]
+                    [--registry-cache=<registry.json>]
        transmogrify --list
                     [--include=package_or_module>...]
+                    [--registry-cache=<registry.json>]
        transmogrify --show=<pipeline>
                     [--include=package_or_module>...]
+                    [--registry-cache=<registry.json>]
 """
 from __future__ import unicode_literals
 from __future__ import print_function
@@ -22,40 +26,29 @@ import logging
 import sys
 
 from docopt import docopt
-from future.moves.collections import OrderedDict
+from collections import OrderedDict
 from six import BytesIO
+from zope.component import getGlobalSiteManager
 from zope.component import getUtilitiesFor
 from zope.component.hooks import getSite
 from zope.component.hooks import setSite
-from zope.configuration import xmlconfig
-from zope.configuration.config import ConfigurationMachine
-from zope.configuration.xmlconfig import registerCommonDirectives
 
 from configparser import RawConfigParser
 
+from transmogrifier.compat import is_installed
 from transmogrifier.interfaces import ISectionBlueprint
 from transmogrifier.interfaces import ITransmogrifier
 from transmogrifier.registry import configuration_registry
+from transmogrifier.snapshot import RegistryCache
+from transmogrifier.snapshot import get_registrations
+from transmogrifier.snapshot import is_captured
 from transmogrifier.utils import load_config
 from transmogrifier.utils import get_lines
 
-from pkg_resources import get_distribution
-from pkg_resources import DistributionNotFound
-from pkg_resources import resource_exists
+HAS_VENUSIANCONFIGURATION = is_installed('venusianconfiguration')
+HAS_ZOPE = is_installed('Zope2')
 
-try:
-    get_distribution('venusianconfiguration')
-except DistributionNotFound:
-    HAS_VENUSIANCONFIGURATION = False
-else:
-    HAS_VENUSIANCONFIGURATION = True
-
-try:
-    get_distribution('Zope2')
-except DistributionNotFound:
-    HAS_ZOPE = False
-else:
-    HAS_ZOPE = True
+logger = logging.getLogger('transmogrifier')
 
 
 def get_argv():
@@ -108,6 +101,17 @@ def get_pipelines(arguments):
             yield candidate
 
 
+def resource_exists(package, filename):
+    """Return True when the file exists in the directory of the package"""
+    try:
+        module = importlib.import_module(package)
+    except ImportError:
+        return False
+    path = getattr(module, '__file__', None)
+    return bool(path) and os.path.isfile(
+        os.path.join(os.path.dirname(path), filename))
+
+
 def parse_include(spec):
     cleanup = False
     if '.' not in sys.path:
@@ -132,6 +136,20 @@ def parse_include(spec):
 
 
 def configure(arguments):
+    # Restore registrations from the snapshot of an earlier run
+    includes = sorted(set(arguments.get('--include')))
+    cache_path = arguments.get('--registry-cache')
+    if cache_path and not os.path.isabs(cache_path):
+        cache_path = os.path.join(os.getcwd(), cache_path)
+    registry_cache = cache_path and RegistryCache(cache_path) or None
+    if registry_cache is not None and registry_cache.restore(includes):
+        return
+
+    # Imported only when needed, because restoring does not need them
+    from zope.configuration import xmlconfig
+    from zope.configuration.config import ConfigurationMachine
+    from zope.configuration.xmlconfig import registerCommonDirectives
+
     # Enable venuasianconfiguration
     if HAS_VENUSIANCONFIGURATION:
         import venusianconfiguration
@@ -142,6 +160,8 @@ def configure(arguments):
         try:
             import Zope2.App.zcml
             config = Zope2.App.zcml._context or ConfigurationMachine()
+            # Zope's configuration context must execute every action
+            registry_cache = None
         except (ImportError, AttributeError):
             config = ConfigurationMachine()
     else:
@@ -155,7 +175,7 @@ def configure(arguments):
     xmlconfig.include(config, package=transmogrifier, file='configure.zcml')
 
     # Resolve includes
-    for include in set(arguments.get('--include')):
+    for include in includes:
         package, filename = parse_include(include)
         if package and filename:
             package = importlib.import_module(package)
@@ -164,9 +184,27 @@ def configure(arguments):
             # Support including single module in the current working directory
             import venusianconfiguration
             venusianconfiguration.venusianscan(package, config)
-
+            # Scanned modules are not tracked for changes
+            registry_cache = None
+
+    # Snapshots cannot restore other side effects than registrations
+    if registry_cache is not None and not all(map(is_captured,
+                                                  config.actions)):
+        logger.info('Not caching registrations, because the configuration '
+                    'has other side effects')
+        registry_cache = None
+
+    # The files read by the configuration are not part of the public API
+    seen_files = getattr(config, '_seen_files', None)
+    if seen_files is None:
+        registry_cache = None
+
+    before = get_registrations(getGlobalSiteManager())
     config.execute_actions()
 
+    if registry_cache is not None:
+        registry_cache.save(includes, seen_files, before)
+
 
 def resolve(pipeline):
     config = load_config(pipeline)
@@ -267,4 +305,6 @@ Available pipelines
             configuration_registry.registerConfiguration(
                 name=pipeline, title=pipeline,
                 description='n/a', configuration=path)
-        ITransmogrifier(context)(pipeline, **overrides)
+        transmogrifier = ITransmogrifier(context)
+        transmogrifier.resume = bool(arguments.get('--resume'))
+        transmogrifier(pipeline, **overrides)
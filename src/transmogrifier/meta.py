@@ -3,18 +3,22 @@ from __future__ import unicode_literals
 
 from zope.component.zcml import IUtilityDirective
 from zope.component.zcml import utility
+from zope.configuration.exceptions import ConfigurationError
 from zope.configuration.fields import MessageID
 from zope.configuration.fields import Path
 from zope.interface import Interface
+from zope.schema import TextLine
 
+from transmogrifier.compat import get_version
+from transmogrifier.compat import is_installed
 from transmogrifier.interfaces import ISectionBlueprint
-from transmogrifier.interfaces import ISection
+from transmogrifier.registry import LazyBlueprint
 from transmogrifier.registry import configuration_registry
+from transmogrifier.registry import verify_blueprint
 
 import six
-import pkg_resources
 
-ZOPE_SCHEMA = pkg_resources.get_distribution("zope.schema").version
+ZOPE_SCHEMA = get_version("zope.schema")
 
 
 if ZOPE_SCHEMA >= "4.6.0":
@@ -67,6 +71,12 @@ class IBlueprintDirective(IUtilityDirective):
     """Section blueprint
     """
 
+    component = TextLine(
+        title='Component',
+        description='Dotted name of the blueprint, imported on first use.',
+        required=False
+    )
+
 
 def pipeline(_context, configuration,
              name='default', title=None, description=None):
@@ -84,8 +94,34 @@ def pipeline(_context, configuration,
         args=(name, title, description, configuration))
 
 
+def get_dotted_name(_context, name):
+    """Return absolute dotted name or None for names relative to unknown
+    or parent packages
+    """
+    name = name.strip()
+    if name.startswith('.'):
+        if _context.package is None or name.startswith('..') or name == '.':
+            return None
+        name = _context.package.__name__ + name
+    return name
+
+
 def blueprint(_context, provides=ISectionBlueprint, component=None,
               factory=None, permission=None, name=''):
-    assert ISection in component.__implemented__
+    dotted_name = component and get_dotted_name(_context, component)
+    if (dotted_name and provides is ISectionBlueprint and
+            factory is None and permission is None):
+        # Only the module is looked up, because importing it is deferred
+        module = dotted_name.rsplit('.', 1)[0]
+        if not (is_installed(module) or is_installed(dotted_name)):
+            raise ConfigurationError(
+                'Module of blueprint {0:s} cannot be found'.format(
+                    dotted_name))
+        utility(_context, provides=provides,
+                component=LazyBlueprint(dotted_name), name=name)
+        return
+    if component is not None:
+        component = _context.resolve(component)
+    verify_blueprint(component)
     utility(_context, provides=provides, component=component,
             factory=factory, permission=permission, name=name)
@@ -1,7 +1,178 @@
 # -*- coding: utf-8 -*-
-from future.moves.collections import UserDict
+try:
+    from collections import UserDict
+except ImportError:  # Python 2
+    from future.moves.collections import UserDict
 import re
 
+from six import iteritems
+
+_template_split = re.compile(r'([$]{[^}]*})').split
+_valid = re.compile(r'\${[-a-zA-Z0-9 ._]*:[-a-zA-Z0-9 ._]+}$').match
+_tales = re.compile(r'^\s*string:', re.MULTILINE).match
+
+
+def format_node(node):
+    return '{0:s}:{1:s}'.format(*node)
+
+
+class Substitutions(object):
+    """Substituted option values of a configuration
+
+    Options with ``${section:option}`` references form a dependency graph,
+    which is resolved in topological order, so that every option is
+    substituted only once. Errors, like invalid or missing references and
+    circular references, are recorded for the affected options and their
+    dependents, and raised only when their section is requested.
+
+    """
+    def __init__(self, config):
+        self.config = config
+        self.templates = {}
+        self.dependencies = {}
+        self.dependents = {}
+        self.values = {}
+        self.errors = {}
+        for section, options in iteritems(config):
+            for key, value in iteritems(options):
+                if '${' in value:
+                    self.parse((section, key), value)
+        self.resolve(list(self.templates))
+
+    def parse(self, node, value):
+        """Parse value of the option into its template and dependencies"""
+        parts = _template_split(value)
+        dependencies = []
+        for i in range(1, len(parts), 2):
+            ref = parts[i]
+            if not _valid(ref):
+                # A value with a string: TALES expression?
+                if _tales(value):
+                    continue
+                self.errors[node] = ValueError(
+                    'Not a valid substitution %s.' % ref)
+                break
+            names = tuple(ref[2:-1].split(':'))
+            if not names[0]:
+                names = node[0], names[1]
+            parts[i] = names
+            dependencies.append(names)
+        self.templates[node] = parts
+        self.dependencies[node] = dependencies
+        for dependency in dependencies:
+            self.dependents.setdefault(dependency, set()).add(node)
+
+    def sort(self, nodes):
+        """Return the given options and their dependencies in topological
+        order, recording circular references as errors
+        """
+        order = []
+        done = set()
+        for node in nodes:
+            if node in done:
+                continue
+            # Depth first search with an explicit stack of the current path
+            path = [node]
+            on_path = {node}
+            stack = [iter(self.dependencies.get(node, ()))]
+            while stack:
+                for dependency in stack[-1]:
+                    if dependency in on_path:
+                        cycle = path[path.index(dependency):] + [dependency]
+                        error = ValueError(
+                            'Circular reference in substitutions: ' +
+                            ' -> '.join(map(format_node, cycle)))
+                        for node_ in cycle:
+                            self.errors.setdefault(node_, error)
+                    elif dependency not in done and \
+                            dependency in self.templates:
+                        path.append(dependency)
+                        on_path.add(dependency)
+                        stack.append(iter(self.dependencies[dependency]))
+                        break
+                else:
+                    stack.pop()
+                    node_ = path.pop()
+                    on_path.discard(node_)
+                    done.add(node_)
+                    order.append(node_)
+        return order
+
+    def resolve(self, nodes):
+        """Substitute values of the given options and their dependencies"""
+        config = self.config
+        values = self.values
+        errors = self.errors
+        for node in self.sort(nodes):
+            if node in errors or node in values:
+                continue
+            parts = self.templates[node]
+            for dependency in self.dependencies[node]:
+                if dependency in errors:
+                    errors[node] = errors[dependency]
+                    break
+                if dependency not in values and (
+                        dependency[0] not in config or
+                        dependency[1] not in config[dependency[0]]):
+                    errors[node] = KeyError(
+                        'Referenced option does not exist:', *dependency)
+                    break
+            else:
+                values[node] = ''.join([
+                    (values[part] if part in values
+                     else config[part[0]][part[1]])
+                    if isinstance(part, tuple) else part
+                    for part in parts])
+
+    def invalidate(self, nodes):
+        """Substitute the given options and their dependents again after
+        their values have been changed in the configuration
+        """
+        affected = set()
+        pending = list(nodes)
+        while pending:
+            node = pending.pop()
+            if node in affected:
+                continue
+            affected.add(node)
+            pending.extend(self.dependents.get(node, ()))
+        for node in affected:
+            self.values.pop(node, None)
+            self.errors.pop(node, None)
+        for node in nodes:
+            for dependency in self.dependencies.pop(node, ()):
+                self.dependents[dependency].discard(node)
+            self.templates.pop(node, None)
+            value = self.config[node[0]][node[1]]
+            if '${' in value:
+                self.parse(node, value)
+        self.resolve([node for node in affected if node in self.templates])
+
+    def copy(self, config):
+        """Return a copy of the substitutions for a copy of the
+        configuration
+        """
+        result = Substitutions.__new__(Substitutions)
+        result.config = config
+        result.templates = self.templates.copy()
+        result.dependencies = self.dependencies.copy()
+        result.dependents = dict((node, nodes.copy()) for node, nodes
+                                 in iteritems(self.dependents))
+        result.values = self.values.copy()
+        result.errors = self.errors.copy()
+        return result
+
+    def get_section(self, section):
+        """Return options of the section with their values substituted"""
+        options = dict(self.config[section])
+        for key in options:
+            node = section, key
+            if node in self.errors:
+                raise self.errors[node]
+            if node in self.values:
+                options[key] = self.values[node]
+        return options
+
 
 class Options(UserDict):
     def __init__(self, transmogrifier, section, data):
@@ -12,62 +183,19 @@ class Options(UserDict):
         self.data = {}
 
     def substitute(self):
-        for key, value in self._data.items():
-            if '${' in value:
-                self._cooked[key] = self._sub(value, [(self.section, key)])
+        self._cooked = self.transmogrifier.substitutions.get_section(
+            self.section)
 
-    def get(self, option, default=None, seen=None):
+    def get(self, option, default=None):
         try:
             return self.data[option]
         except KeyError:
             pass
-
-        value = self._cooked.get(option)
-        if value is None:
-            value = self._data.get(option)
-            if value is None:
-                return default
-
-        if '${' in value:
-            key = self.section, option
-            if seen is None:
-                seen = [key]
-            elif key in seen:
-                raise ValueError('Circular reference in substitutions.')
-            else:
-                seen.append(key)
-
-            value = self._sub(value, seen)
-            seen.pop()
-
-        self.data[option] = value
-        return value
-
-    _template_split = re.compile(r'([$]{[^}]*})').split
-    _valid = re.compile(r'\${[-a-zA-Z0-9 ._]*:[-a-zA-Z0-9 ._]+}$').match
-    _tales = re.compile(r'^\s*string:', re.MULTILINE).match
-
-    def _sub(self, template, seen):
-        parts = self._template_split(template)
-        subs = []
-        for ref in parts[1::2]:
-            if not self._valid(ref):
-                # A value with a string: TALES expression?
-                if self._tales(template):
-                    subs.append(ref)
-                    continue
-                raise ValueError('Not a valid substitution %s.' % ref)
-
-            names = tuple(ref[2:-1].split(':'))
-            if not names[0]:
-                names = seen[0][0], names[1]
-            value = self.transmogrifier[names[0]].get(names[1], None, seen)
-            if value is None:
-                raise KeyError('Referenced option does not exist:', *names)
-            subs.append(value)
-        subs.append('')
-
-        return ''.join([''.join(v) for v in zip(parts[::2], subs)])
+        try:
+            return self._cooked[option]
+        except KeyError:
+            pass
+        return self._data.get(option, default)
 
     def __getitem__(self, key):
         try:
@@ -110,7 +238,7 @@ class Options(UserDict):
             yield key
 
     def has_key(self, key):
-        return key in self.keys()
+        return key in self.data or key in self._data
 
     def iterkeys(self):
         for key in self.keys():
@@ -129,11 +257,12 @@ class Options(UserDict):
     itervalues = values
 
     def __len__(self):
-        return len(list(self.keys()))
+        return len(self._data) + len([k for k in self.data
+                                      if k not in self._data])
 
     def __iter__(self):
         for k in self.keys():
             yield k
 
     def __contains__(self, key):
-        return key in self.keys()
+        return key in self.data or key in self._data
@@ -1,5 +1,11 @@
 # -*- coding: utf-8 -*-
-import pkg_resources
+from zope.configuration.exceptions import ConfigurationError
+from zope.configuration.name import resolve
+from zope.interface import implementer
+
+from transmogrifier.compat import is_installed
+from transmogrifier.interfaces import ISection
+from transmogrifier.interfaces import ISectionBlueprint
 
 
 # noinspection PyPep8Naming
@@ -34,6 +40,41 @@ class ConfigurationRegistry(object):
 configuration_registry = ConfigurationRegistry()
 
 
+def verify_blueprint(component, name=None):
+    """Raise ConfigurationError unless the component creates ISections"""
+    try:
+        implemented = ISection.implementedBy(component)
+    except TypeError:
+        implemented = False
+    if not implemented:
+        raise ConfigurationError(
+            'Blueprint {0!s} does not implement ISection'.format(
+                name or component))
+
+
+@implementer(ISectionBlueprint)
+class LazyBlueprint(object):
+    """Section blueprint, which imports its component by the dotted name on
+    the first use
+    """
+    def __init__(self, dotted_name):
+        self.dotted_name = dotted_name
+        self.component = None
+
+    def resolve(self):
+        if self.component is None:
+            component = resolve(self.dotted_name)
+            verify_blueprint(component, self.dotted_name)
+            self.component = component
+        return self.component
+
+    def __call__(self, transmogrifier, name, options, previous):
+        return self.resolve()(transmogrifier, name, options, previous)
+
+    def __repr__(self):
+        return '<LazyBlueprint {0:s}>'.format(self.dotted_name)
+
+
 try:
     from zope.testing.cleanup import addCleanUp
 except ImportError:
@@ -44,8 +85,5 @@ else:
 
 
 # BBB: Support collective.transmogrifier
-try:
-    pkg_resources.get_distribution('collective.transmogrifier')
+if is_installed('collective.transmogrifier'):
     from collective.transmogrifier.transmogrifier import configuration_registry  # noqa
-except pkg_resources.DistributionNotFound:
-    pass
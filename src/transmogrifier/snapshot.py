@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import importlib
+import json
+import logging
+import os
+import sys
+
+from zope.component import getGlobalSiteManager
+
+from transmogrifier.cache import get_signature
+from transmogrifier.registry import LazyBlueprint
+from transmogrifier.registry import configuration_registry
+
+logger = logging.getLogger('transmogrifier')
+
+# Prefix of the dotted names of lazily imported blueprints
+LAZY = '*'
+
+
+def get_dotted_name(obj):
+    """Return dotted name of a module level object or None when the object
+    cannot be imported by its name
+    """
+    if isinstance(obj, LazyBlueprint):
+        return LAZY + obj.dotted_name
+    module = getattr(obj, '__module__', None)
+    name = getattr(obj, '__qualname__', None) or getattr(obj, '__name__', None)
+    if not module or not name or '<' in name:
+        return None
+    dotted_name = '{0:s}:{1:s}'.format(module, name)
+    try:
+        if resolve_dotted_name(dotted_name) is not obj:
+            return None
+    except (ImportError, AttributeError):
+        return None
+    return dotted_name
+
+
+def resolve_dotted_name(dotted_name):
+    if dotted_name.startswith(LAZY):
+        return LazyBlueprint(dotted_name[len(LAZY):])
+    module, name = dotted_name.split(':', 1)
+    obj = importlib.import_module(module)
+    for part in name.split('.'):
+        obj = getattr(obj, part)
+    return obj
+
+
+def get_registrations(site_manager):
+    """Return the component registrations of the site manager"""
+    registrations = []
+    for registration in site_manager.registeredUtilities():
+        registrations.append(('utility', registration.provided,
+                              registration.name, registration.component))
+    for registration in site_manager.registeredAdapters():
+        registrations.append(('adapter', registration.provided,
+                              registration.name, registration.factory,
+                              tuple(registration.required)))
+    for registration in site_manager.registeredSubscriptionAdapters():
+        registrations.append(('subscriber', registration.provided,
+                              registration.name, registration.factory,
+                              tuple(registration.required)))
+    for registration in site_manager.registeredHandlers():
+        registrations.append(('handler', None, registration.name,
+                              registration.handler,
+                              tuple(registration.required)))
+    return registrations
+
+
+def dump_registration(registration):
+    """Return registration with its components as dotted names or None when
+    some of them cannot be imported by their names
+    """
+    objects = [registration[1], registration[3]] + list(registration[4:5])
+    names = []
+    for obj in objects:
+        if isinstance(obj, tuple):
+            names.append([get_dotted_name(spec) for spec in obj])
+            if None in names[-1]:
+                return None
+        elif obj is None:
+            names.append(None)
+        else:
+            names.append(get_dotted_name(obj))
+            if names[-1] is None:
+                return None
+    return [registration[0], registration[2]] + names
+
+
+def is_captured(action):
+    """Return True when a snapshot restores the effects of the configuration
+    action, which is a registration in the site manager or of a pipeline
+    configuration
+    """
+    from zope.component.interface import provideInterface
+    from zope.component.zcml import handler
+    callable_ = action.get('callable')
+    args = action.get('args') or ()
+    if callable_ is None:
+        return True
+    elif callable_ == configuration_registry.registerConfiguration:
+        return True
+    elif callable_ is handler:
+        return bool(args) and args[0] in (
+            'registerUtility', 'registerAdapter',
+            'registerSubscriptionAdapter', 'registerHandler')
+    elif callable_ is provideInterface:
+        # Marking the interface with its interface type is not captured
+        iface_type = len(args) > 2 and args[2] or None
+        return (iface_type or (action.get('kw') or {}).get('iface_type')) \
+            is None
+    return False
+
+
+def load_registration(data):
+    kind, name, provided, component = data[:4]
+    provided = provided and resolve_dotted_name(provided)
+    component = resolve_dotted_name(component)
+    required = [resolve_dotted_name(spec) for spec in data[4:5] and data[4]]
+    return kind, name, provided, component, required
+
+
+class RegistryCache(object):
+    """Cache of the component registrations made by configuration files
+
+    A snapshot of the utilities, adapters, subscribers and handlers
+    registered while executing the configuration, and of the registered
+    pipeline configurations, is stored into the JSON file of ``path``, keyed
+    by the included packages. A snapshot is restored as long as none of the
+    configuration files read for it has been modified, and the working
+    directory, ``sys.path`` and the modification times of its package
+    directories, which change when packages are installed, are unchanged.
+
+    Registrations of components, which cannot be imported by their dotted
+    names, cannot be restored and prevent taking a snapshot. Only the
+    effects of the actions accepted by ``is_captured`` are restored, so
+    configurations with any other actions, such as security declarations,
+    interface types or custom directives, must not be saved. Registration
+    events are not notified, and import time side effects of the packages
+    happen only when their components are imported.
+
+    """
+    def __init__(self, path):
+        self.path = path
+        # Importing may extend sys.path, so it is fixed before configuring
+        self.sys_path = list(sys.path)
+
+    def get_key(self, includes):
+        return json.dumps([sorted(set(includes)), os.getcwd(), self.sys_path])
+
+    def get_environment(self):
+        # The first path is the directory of the script, not of packages
+        return [[path, get_signature(path)] for path in self.sys_path[1:]
+                if path]
+
+    def read(self):
+        if not os.path.isfile(self.path):
+            return {}
+        try:
+            with open(self.path) as fp:
+                return json.load(fp)
+        except ValueError:
+            logger.warning('Ignoring invalid registry cache {0:s}'.format(
+                self.path))
+            return {}
+
+    def write(self, snapshots):
+        tmp = '{0:s}.{1:d}.tmp'.format(self.path, os.getpid())
+        with open(tmp, 'w') as fp:
+            json.dump(snapshots, fp)
+        if hasattr(os, 'replace'):
+            os.replace(tmp, self.path)
+        else:
+            os.rename(tmp, self.path)
+
+    def is_valid(self, snapshot):
+        if snapshot['environment'] != self.get_environment():
+            return False
+        for path, signature in snapshot['files']:
+            if get_signature(path) != signature:
+                return False
+        return True
+
+    def restore(self, includes, site_manager=None):
+        """Restore the registrations of the given includes and return True,
+        or return False without registering anything when there is no valid
+        snapshot
+        """
+        snapshot = self.read().get(self.get_key(includes))
+        if snapshot is None or not self.is_valid(snapshot):
+            return False
+        try:
+            registrations = list(map(load_registration,
+                                     snapshot['registrations']))
+        except (ImportError, AttributeError, ValueError):
+            return False
+
+        if site_manager is None:
+            site_manager = getGlobalSiteManager()
+        for kind, name, provided, component, required in registrations:
+            if kind == 'utility':
+                site_manager.registerUtility(
+                    component, provided, name, event=False)
+            elif kind == 'adapter':
+                site_manager.registerAdapter(
+                    component, required, provided, name, event=False)
+            elif kind == 'subscriber':
+                site_manager.registerSubscriptionAdapter(
+                    component, required, provided, name, event=False)
+            elif kind == 'handler':
+                site_manager.registerHandler(
+                    component, required, name, event=False)
+        for configuration in snapshot['configurations']:
+            configuration_registry.registerConfiguration(**configuration)
+        return True
+
+    def save(self, includes, files, before, site_manager=None):
+        """Save snapshot of the registrations made since ``before``, which is
+        the result of ``get_registrations`` before executing the
+        configuration, and of all the registered pipeline configurations
+        """
+        if site_manager is None:
+            site_manager = getGlobalSiteManager()
+        before = set(before)
+        registrations = []
+        for registration in get_registrations(site_manager):
+            if registration in before:
+                continue
+            data = dump_registration(registration)
+            if data is None:
+                logger.info('Not caching registrations, because {0!r} '
+                            'cannot be imported by its name'.format(
+                                registration[3]))
+                return False
+            registrations.append(data)
+
+        configurations = []
+        for configuration_id in configuration_registry.listConfigurationIds():
+            info = configuration_registry.getConfiguration(configuration_id)
+            configurations.append(dict(
+                name=info['id'], title=info['title'],
+                description=info['description'],
+                configuration=info['configuration']))
+
+        snapshots = self.read()
+        snapshots[self.get_key(includes)] = {
+            'environment': self.get_environment(),
+            'files': [[path, get_signature(path)] for path in sorted(files)],
+            'registrations': registrations,
+            'configurations': configurations,
+        }
+        self.write(snapshots)
+        return True
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from bisect import bisect_right
+from collections import OrderedDict
+import bz2
+import datetime
+import json
+import mmap
+import os
+import struct
+import zlib
+
+import six
+
+try:
+    import lzma
+except ImportError:  # Python 2 without backports.lzma
+    lzma = None
+
+MAGIC = b'TMSPOOL2'
+BLOCK_SIZE = 1000
+
+BLOCK_HEADER = struct.Struct(str('<BII'))  # codec, payload length, items
+INDEX_ENTRY = struct.Struct(str('<QQ'))  # block offset, first item
+FOOTER = struct.Struct(str('<QQ8s'))  # index offset, items, magic
+
+CODECS = {
+    'none': 0,
+    'zlib': 1,
+    'bz2': 2,
+    'lzma': 3,
+}
+
+ALIASES = {
+    'gzip': 'zlib',
+    'gz': 'zlib',
+    'bzip2': 'bz2',
+    'xz': 'lzma',
+}
+
+
+def _identity(data):
+    return data
+
+
+COMPRESS = {
+    0: _identity,
+    1: zlib.compress,
+    2: bz2.compress,
+    3: lzma and lzma.compress,
+}
+
+DECOMPRESS = {
+    0: _identity,
+    1: zlib.decompress,
+    2: bz2.decompress,
+    3: lzma and lzma.decompress,
+}
+
+LENGTH = struct.Struct(str('<I'))  # record length
+
+# Key of the JSON objects encoding values, which JSON has no type for
+TAG = '\x00'
+
+# Lone surrogates of decoded file names are kept as such
+TEXT_ERRORS = six.PY2 and 'strict' or 'surrogatepass'
+
+JSON_TYPES = frozenset(
+    six.integer_types + (six.text_type, float, bool, type(None)))
+
+
+def _encode_dict(value):
+    if TAG not in value and all(type(key) is six.text_type
+                                for key in value):
+        return dict((key, encode_value(value_))
+                    for key, value_ in value.items())
+    return {TAG: 'd', 'v': _encode_pairs(value)}
+
+
+def _encode_tagged(tag, encode):
+    def encode_tagged(value):
+        return {TAG: tag, 'v': encode(value)}
+    return encode_tagged
+
+
+def _encode_values(value):
+    return [encode_value(value_) for value_ in value]
+
+
+def _encode_pairs(value):
+    return [[encode_value(key), encode_value(value_)]
+            for key, value_ in value.items()]
+
+
+def _check_naive(value):
+    if value.tzinfo is not None:
+        raise TypeError('Cannot spool {0:s} with tzinfo: {1!r}'.format(
+            type(value).__name__, value))
+
+
+def _encode_time(value):
+    _check_naive(value)
+    return [value.hour, value.minute, value.second, value.microsecond]
+
+
+def _encode_datetime(value):
+    _check_naive(value)
+    return [value.year, value.month, value.day, value.hour, value.minute,
+            value.second, value.microsecond]
+
+
+ENCODERS = {
+    dict: _encode_dict,
+    list: _encode_values,
+    tuple: _encode_tagged('t', _encode_values),
+    set: _encode_tagged('e', _encode_values),
+    frozenset: _encode_tagged('z', _encode_values),
+    OrderedDict: _encode_tagged('o', _encode_pairs),
+    six.binary_type: _encode_tagged(
+        'b', lambda value: value.decode('latin-1')),
+    complex: _encode_tagged('c', lambda value: [value.real, value.imag]),
+    datetime.date: _encode_tagged(
+        'D', lambda value: [value.year, value.month, value.day]),
+    datetime.time: _encode_tagged('H', _encode_time),
+    datetime.datetime: _encode_tagged('M', _encode_datetime),
+    datetime.timedelta: _encode_tagged('R', lambda value: [
+        value.days, value.seconds, value.microseconds]),
+}
+
+DECODERS = {
+    'd': dict,
+    't': tuple,
+    'e': set,
+    'z': frozenset,
+    'o': OrderedDict,
+    'b': lambda value: value.encode('latin-1'),
+    'c': lambda value: complex(*value),
+    'D': lambda value: datetime.date(*value),
+    'H': lambda value: datetime.time(*value),
+    'M': lambda value: datetime.datetime(*value),
+    'R': lambda value: datetime.timedelta(*value),
+}
+
+
+def encode_value(value):
+    """Return the value converted into the values JSON has types for"""
+    cls = type(value)
+    if cls in JSON_TYPES:
+        return value
+    encode = ENCODERS.get(cls)
+    if encode is None:
+        raise TypeError('Cannot spool value of type {0:s}: {1!r}'.format(
+            cls.__name__, value))
+    return encode(value)
+
+
+def _decode_object(obj):
+    tag = obj.get(TAG)
+    if tag is None:
+        return obj
+    return DECODERS[tag](obj['v'])
+
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+_loads = json.JSONDecoder(object_hook=_decode_object).decode
+
+
+def encode_record(item):
+    """Return the item encoded as a length prefixed record"""
+    data = _dumps(encode_value(item)).encode('utf-8', TEXT_ERRORS)
+    return LENGTH.pack(len(data)) + data
+
+
+def decode_records(data, start=0, stop=None):
+    """Return the items of the records from start until stop
+
+    Records before start are skipped by their length without decoding them.
+
+    """
+    items = []
+    pos = 0
+    number = 0
+    try:
+        while pos < len(data) and (stop is None or number < stop):
+            length, = LENGTH.unpack_from(data, pos)
+            pos += LENGTH.size + length
+            if pos > len(data):
+                raise ValueError('Truncated record')
+            if number >= start:
+                items.append(_loads(data[pos - length:pos].decode(
+                    'utf-8', TEXT_ERRORS)))
+            number += 1
+    except (struct.error, KeyError, TypeError, ValueError,
+            OverflowError) as e:
+        raise ValueError('Corrupted spool record {0:d}: {1!s}'.format(
+            number, e))
+    return items
+
+
+def get_codec(compression):
+    """Return codec number of the named compression"""
+    compression = (compression or 'none').strip().lower()
+    compression = ALIASES.get(compression, compression)
+    if compression not in CODECS:
+        raise ValueError('Unknown compression: {0:s}'.format(compression))
+    codec = CODECS[compression]
+    if COMPRESS[codec] is None:
+        raise ValueError('{0:s} compression is not available'.format(
+            compression))
+    return codec
+
+
+class SpoolWriter(object):
+    """Write items into a spool file
+
+    A spool file starts with ``MAGIC`` followed by blocks of up to
+    ``block_size`` items. Each block has a header of its codec, payload
+    length and item count, and its payload is the sequence of its item
+    records, optionally compressed. A record is the length of the item
+    followed by the item encoded as JSON, where the values of the types in
+    ``ENCODERS`` are objects tagged with the ``TAG`` key, so reading a spool
+    never executes code. Items are encoded when they are written,
+    because the following pipeline sections may still change them. On
+    close, an index of the block offsets and the numbers of their first
+    items is written, followed by a footer of the index offset, the item
+    count and ``MAGIC``.
+
+    Writing continues after the blocks of an existing spool, when its
+    ``index`` and item ``count`` are given with a file positioned after its
+    last block.
+
+    """
+    def __init__(self, fp, compression='none', block_size=BLOCK_SIZE,
+                 index=None, count=0):
+        self.fp = fp
+        self.codec = get_codec(compression)
+        self.compress = COMPRESS[self.codec]
+        self.block_size = block_size
+        self.records = []
+        if index is None:
+            self.index = []
+            self.count = 0
+            self.offset = len(MAGIC)
+            self.fp.write(MAGIC)
+        else:
+            self.index = list(index)
+            self.count = count
+            self.offset = self.fp.tell()
+
+    @classmethod
+    def append(cls, path, *args, **kwargs):
+        """Return writer adding items to the spool file of the path, which is
+        created when it does not exist
+        """
+        if not os.path.isfile(path) or not os.path.getsize(path):
+            return cls(open(path, 'wb'), *args, **kwargs)
+        reader = SpoolReader(path, use_mmap=False)
+        try:
+            index, count, end = reader.index, reader.count, reader.end
+        finally:
+            reader.close()
+        fp = open(path, 'r+b')
+        # The index and the footer are written again on close
+        fp.seek(end)
+        fp.truncate()
+        return cls(fp, *args, index=index, count=count, **kwargs)
+
+    def write(self, item):
+        self.records.append(encode_record(item))
+        if len(self.records) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """Write the collected records as a block"""
+        if not self.records:
+            return
+        payload = self.compress(b''.join(self.records))
+        self.index.append((self.offset, self.count))
+        self.fp.write(BLOCK_HEADER.pack(
+            self.codec, len(payload), len(self.records)))
+        self.fp.write(payload)
+        self.offset += BLOCK_HEADER.size + len(payload)
+        self.count += len(self.records)
+        self.records = []
+
+    def close(self):
+        """Write the remaining items and the index, and close the file"""
+        try:
+            self.flush()
+            self.fp.write(b''.join(INDEX_ENTRY.pack(offset, first)
+                                   for offset, first in self.index))
+            self.fp.write(FOOTER.pack(self.offset, self.count, MAGIC))
+        finally:
+            self.fp.close()
+
+
+class SpoolReader(object):
+    """Read items from a spool file, optionally through a memory map
+
+    The index allows slicing the spool without reading the blocks before
+    the slice, and the record lengths allow skipping the records before it
+    within its first block. Spools without a footer, left by an interrupted
+    writer, are indexed by scanning their blocks.
+
+    """
+    def __init__(self, path, use_mmap=True):
+        self.fp = open(path, 'rb')
+        self.size = os.fstat(self.fp.fileno()).st_size
+        self.data = None
+        if use_mmap and self.size:
+            self.data = mmap.mmap(self.fp.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        if self.read(0, len(MAGIC)) != MAGIC:
+            self.close()
+            raise ValueError('Not a spool file: {0:s}'.format(path))
+        self.index, self.count, self.end = self.read_index()
+        self.firsts = [first for offset, first in self.index]
+
+    def read(self, offset, size):
+        if self.data is not None:
+            return self.data[offset:offset + size]
+        self.fp.seek(offset)
+        return self.fp.read(size)
+
+    def read_index(self):
+        """Return the index, the item count and the end of the blocks"""
+        if self.size >= len(MAGIC) + FOOTER.size:
+            index_offset, count, magic = FOOTER.unpack(
+                self.read(self.size - FOOTER.size, FOOTER.size))
+            if magic == MAGIC:
+                data = self.read(index_offset,
+                                 self.size - FOOTER.size - index_offset)
+                return [INDEX_ENTRY.unpack_from(data, offset) for offset
+                        in range(0, len(data), INDEX_ENTRY.size)], \
+                    count, index_offset
+
+        # Scan the blocks of an incomplete spool
+        index = []
+        count = 0
+        offset = len(MAGIC)
+        while offset + BLOCK_HEADER.size <= self.size:
+            codec, length, items = BLOCK_HEADER.unpack(
+                self.read(offset, BLOCK_HEADER.size))
+            if offset + BLOCK_HEADER.size + length > self.size:
+                break
+            index.append((offset, count))
+            count += items
+            offset += BLOCK_HEADER.size + length
+        return index, count, offset
+
+    def __len__(self):
+        return self.count
+
+    def read_block(self, block, start=0, stop=None):
+        """Return the list of the items of a block from start until stop"""
+        offset = self.index[block][0]
+        codec, length, count = BLOCK_HEADER.unpack(
+            self.read(offset, BLOCK_HEADER.size))
+        if codec not in DECOMPRESS:
+            raise ValueError('Unknown spool codec: {0:d}'.format(codec))
+        return decode_records(DECOMPRESS[codec](
+            self.read(offset + BLOCK_HEADER.size, length)), start, stop)
+
+    def iter_slice(self, start=0, stop=None):
+        """Yield item numbers and items from start until stop"""
+        stop = self.count if stop is None else min(stop, self.count)
+        block = max(bisect_right(self.firsts, start) - 1, 0)
+        for block in range(block, len(self.index)):
+            first = self.firsts[block]
+            if first >= stop:
+                break
+            low = max(start - first, 0)
+            items = self.read_block(block, low, stop - first)
+            for number, item in enumerate(items, first + low):
+                yield number, item
+
+    def __iter__(self):
+        for number, item in self.iter_slice():
+            yield item
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+        self.fp.close()
+
+
+def get_shard(shard, count):
+    """Return start and stop of the items of ``index/total`` shard"""
+    index, total = map(int, shard.split('/'))
+    if not 0 <= index < total:
+        raise ValueError('Invalid shard: {0:s}'.format(shard))
+    return index * count // total, (index + 1) * count // total
@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+import io
+import json
 import logging
 import os
+import sys
 import unittest
 import operator
 import doctest
@@ -74,6 +77,59 @@ class MetaDirectivesTests(unittest.TestCase):
                  description='',
                  configuration=os.path.join(os.getcwd(), 'filename.cfg')))
 
+    def testBlueprintZCML(self):
+        xmlconfig.string("""\
+<configure
+    xmlns:transmogrifier="http://namespaces.plone.org/transmogrifier"
+    package="transmogrifier">
+  <transmogrifier:blueprint
+      component="transmogrifier.blueprints.base.PassBlueprint"
+      name="transmogrifier.tests.pass"
+      />
+  <transmogrifier:blueprint
+      component=".blueprints.base.PassBlueprint"
+      name="transmogrifier.tests.relative"
+      />
+</configure>""", context=self.layer.context)
+        self.layer.context.execute_actions()
+
+        from zope.component import getUtility
+        from transmogrifier.blueprints.base import PassBlueprint
+        from transmogrifier.registry import LazyBlueprint
+        for name in ('transmogrifier.tests.pass',
+                     'transmogrifier.tests.relative'):
+            blueprint = getUtility(ISectionBlueprint, name)
+            self.assertIsInstance(blueprint, LazyBlueprint)
+            self.assertIsNone(blueprint.component)
+            section = blueprint(Transmogrifier({}), 'section', {}, iter([1]))
+            self.assertIsInstance(section, PassBlueprint)
+            self.assertIs(blueprint.component, PassBlueprint)
+            self.assertEqual(list(section), [1])
+
+    def testBlueprintZCMLErrors(self):
+        from zope.configuration.exceptions import ConfigurationError
+        self.assertRaises(ConfigurationError, xmlconfig.string, """\
+<configure xmlns:transmogrifier="http://namespaces.plone.org/transmogrifier">
+  <transmogrifier:blueprint
+      component="transmogrifier.blueprints.typo.PassBlueprint"
+      name="transmogrifier.tests.typo"
+      />
+</configure>""", context=self.layer.context)
+        self.assertRaises(ConfigurationError, xmlconfig.string, """\
+<configure xmlns:transmogrifier="http://namespaces.plone.org/transmogrifier">
+  <transmogrifier:blueprint
+      component="transmogrifier.utils.get_words"
+      provides="zope.interface.Interface"
+      name="transmogrifier.tests.eager"
+      />
+</configure>""", context=self.layer.context)
+
+        from transmogrifier.registry import LazyBlueprint
+        blueprint = LazyBlueprint('transmogrifier.utils.get_words')
+        self.assertRaises(ConfigurationError, blueprint,
+                          Transmogrifier({}), 'section', {}, iter([1]))
+        self.assertIsNone(blueprint.component)
+
 
 class OptionSubstitutionTests(unittest.TestCase):
 
@@ -129,6 +185,54 @@ class OptionSubstitutionTests(unittest.TestCase):
                           operator.itemgetter('do_not_exist'), opts['empty'])
         self.assertRaises(KeyError, operator.itemgetter('foo'), opts)
 
+    def testCycle(self):
+        opts = self._loadOptions(dict(
+            spam=dict(monty='${eggs:foo}', python='${:monty}'),
+            eggs=dict(foo='${ham:bar}'),
+            ham=dict(bar='${spam:monty}'),
+        ))
+        with self.assertRaises(ValueError) as context:
+            opts['spam']
+        self.assertIn('spam:monty -> eggs:foo -> ham:bar -> spam:monty',
+                      str(context.exception))
+
+    def testInvalidate(self):
+        from transmogrifier.options import Substitutions
+        config = dict(
+            spam=dict(monty='python', python='${:monty}!'),
+            eggs=dict(foo='${spam:python}', bar='${ham:bar}'),
+            ham=dict(bar='bar'),
+        )
+        substitutions = Substitutions(config)
+        self.assertEqual(substitutions.get_section('eggs'),
+                         dict(foo='python!', bar='bar'))
+
+        config['spam']['monty'] = 'snake'
+        copy = substitutions.copy(config)
+        # Options not depending on the changed option are kept
+        copy.values['eggs', 'bar'] = 'kept'
+        copy.invalidate([('spam', 'monty')])
+        self.assertEqual(copy.get_section('eggs'),
+                         dict(foo='snake!', bar='kept'))
+        self.assertEqual(substitutions.values['eggs', 'foo'], 'python!')
+
+        config['spam']['monty'] = '${eggs:foo}'
+        copy.invalidate([('spam', 'monty')])
+        self.assertRaises(ValueError, copy.get_section, 'eggs')
+        self.assertEqual(copy.get_section('ham'), dict(bar='bar'))
+
+    def testMembership(self):
+        opts = self._loadOptions(dict(spam=dict(monty='python')))
+        options = opts['spam']
+        options['eggs'] = 'foo'
+        self.assertIn('monty', options)
+        self.assertIn('eggs', options)
+        self.assertNotIn('foo', options)
+        self.assertEqual(len(options), 2)
+        del options['monty']
+        self.assertNotIn('monty', options)
+        self.assertEqual(len(options), 1)
+
 
 class InclusionManipulationTests(unittest.TestCase):
 
@@ -179,6 +283,168 @@ bar +=
         self.assertEquals(opts['bar']['baz'], '')
 
 
+class ConfigurationCacheTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def setUp(self):
+        for name, config in [
+                ('base', '[foo]\nbar = base\n'),
+                ('left', '[transmogrifier]\n'
+                         'include = transmogrifier.tests.base\n[left]\n'),
+                ('right', '[transmogrifier]\n'
+                          'include = transmogrifier.tests.base\n[right]\n'),
+                ('main', '[transmogrifier]\n'
+                         'include = transmogrifier.tests.left\n'
+                         '          transmogrifier.tests.right\n')]:
+            self.layer.registerConfiguration(
+                'transmogrifier.tests.' + name, config)
+
+    def _filename(self, name):
+        return os.path.join(self.layer.tempdir,
+                            'transmogrifier.tests.{0:s}.cfg'.format(name))
+
+    def testDiamond(self):
+        from transmogrifier.utils import resolve_config
+        sources = {}
+        config = resolve_config('transmogrifier.tests.main', sources=sources)
+        self.assertEqual(sorted(config), ['foo', 'left', 'right',
+                                          'transmogrifier'])
+        self.assertEqual(len(sources), 4)
+
+    def testInvalidation(self):
+        from transmogrifier.cache import ConfigurationCache
+        cache = ConfigurationCache()
+        config = cache.load('transmogrifier.tests.main', foo={'bar': 'x'})
+        self.assertEqual(config['foo']['bar'], 'x')
+        config['foo']['bar'] = 'changed'
+        self.assertEqual(cache.load('transmogrifier.tests.main',
+                                    foo={'bar': 'x'})['foo']['bar'], 'x')
+        self.assertEqual(cache.load('transmogrifier.tests.main')['foo']['bar'],
+                         'base')
+        self.assertEqual(len(cache.entries), 2)
+
+        with open(self._filename('base'), 'w') as fp:
+            fp.write('[foo]\nbar = modified\n')
+        os.utime(self._filename('base'), (0, 0))
+        self.assertEqual(cache.load('transmogrifier.tests.main')['foo']['bar'],
+                         'modified')
+
+    def testPersistence(self):
+        from transmogrifier.cache import ConfigurationCache
+        path = os.path.join(self.layer.tempdir, 'cache.json')
+        cache = ConfigurationCache(path)
+        cache.load('transmogrifier.tests.main')
+        self.assertFalse(os.path.isfile(path))
+        cache.flush()
+        self.assertTrue(os.path.isfile(path))
+
+        cache = ConfigurationCache(path)
+        cache.read()
+        self.assertEqual(len(cache.entries), 1)
+        entry = list(cache.entries.values())[0]
+        entry['config']['foo']['bar'] = 'cached'
+        self.assertEqual(cache.load('transmogrifier.tests.main')['foo']['bar'],
+                         'cached')
+
+    def testEviction(self):
+        from transmogrifier.cache import ConfigurationCache
+        path = os.path.join(self.layer.tempdir, 'cache.json')
+        cache = ConfigurationCache(path, size=2)
+        cache.load('transmogrifier.tests.left')
+        cache.load('transmogrifier.tests.right')
+        cache.load('transmogrifier.tests.left')
+        cache.load('transmogrifier.tests.main')
+        self.assertEqual([json.loads(key)[0] for key in cache.entries],
+                         ['transmogrifier.tests.left',
+                          'transmogrifier.tests.main'])
+        cache.flush()
+
+        cache = ConfigurationCache(path, size=1)
+        cache.read()
+        self.assertEqual([json.loads(key)[0] for key in cache.entries],
+                         ['transmogrifier.tests.main'])
+
+
+class RegistryCacheTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def setUp(self):
+        from zope.interface.registry import Components
+        from transmogrifier.blueprints.base import PassBlueprint
+        from transmogrifier.registry import LazyBlueprint
+        self.path = os.path.join(self.layer.tempdir, 'registry.json')
+        self.filename = os.path.join(self.layer.tempdir, 'configure.zcml')
+        with open(self.filename, 'w') as fp:
+            fp.write('<configure />')
+        self.components = Components()
+        self.components.registerUtility(
+            PassBlueprint, ISectionBlueprint, 'transmogrifier.tests.pass')
+        self.components.registerUtility(
+            LazyBlueprint('transmogrifier.blueprints.base.PassBlueprint'),
+            ISectionBlueprint, 'transmogrifier.tests.lazy')
+        self.layer.registerConfiguration('transmogrifier.tests.snapshot',
+                                         '[transmogrifier]\n')
+
+    def testRestore(self):
+        from zope.interface.registry import Components
+        from transmogrifier.blueprints.base import PassBlueprint
+        from transmogrifier.snapshot import RegistryCache
+        cache = RegistryCache(self.path)
+        self.assertFalse(cache.restore(['foo'], Components()))
+        self.assertTrue(cache.save(['foo'], [self.filename], [],
+                                   self.components))
+
+        configuration_registry.clear()
+        components = Components()
+        self.assertFalse(cache.restore(['bar'], components))
+        self.assertTrue(cache.restore(['foo'], components))
+        self.assertIs(components.getUtility(
+            ISectionBlueprint, 'transmogrifier.tests.pass'), PassBlueprint)
+        self.assertEqual(components.getUtility(
+            ISectionBlueprint, 'transmogrifier.tests.lazy').dotted_name,
+            'transmogrifier.blueprints.base.PassBlueprint')
+        self.assertEqual(configuration_registry.listConfigurationIds(),
+                         ('transmogrifier.tests.snapshot',))
+
+        configuration_registry.clear()
+        os.utime(self.filename, (0, 0))
+        self.assertFalse(cache.restore(['foo'], Components()))
+
+    def testNotImportable(self):
+        from transmogrifier.blueprints.base import PassBlueprint
+        from transmogrifier.snapshot import RegistryCache
+
+        class LocalBlueprint(PassBlueprint):
+            pass
+
+        self.components.registerUtility(
+            LocalBlueprint, ISectionBlueprint, 'transmogrifier.tests.local')
+        cache = RegistryCache(self.path)
+        self.assertFalse(cache.save(['foo'], [self.filename], [],
+                                    self.components))
+        self.assertFalse(os.path.exists(self.path))
+
+    def testIsCaptured(self):
+        from zope.component.interface import provideInterface
+        from zope.component.zcml import handler
+        from zope.interface.interfaces import IInterface
+        from transmogrifier.snapshot import is_captured
+        self.assertTrue(is_captured(dict(
+            callable=handler, args=('registerUtility', None, ISection))))
+        self.assertTrue(is_captured(dict(
+            callable=configuration_registry.registerConfiguration,
+            args=('name', 'title', 'description', 'filename.cfg'))))
+        self.assertTrue(is_captured(dict(
+            callable=provideInterface, args=('', ISection))))
+        self.assertFalse(is_captured(dict(
+            callable=provideInterface, args=('', ISection, IInterface))))
+        self.assertFalse(is_captured(dict(
+            callable=handler, args=('unregisterUtility', None, ISection))))
+        self.assertFalse(is_captured(dict(callable=os.getcwd, args=())))
+
+
 class ConstructPipelineTests(unittest.TestCase):
 
     layer = TransmogrifierLayer
@@ -210,6 +476,1043 @@ class ConstructPipelineTests(unittest.TestCase):
         self._doConstruct(config, ['noisection'])
 
 
+class PlanTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def setUp(self):
+        self.layer.registerConfiguration('transmogrifier.tests.plan', """\
+[transmogrifier]
+pipeline =
+    source
+    set
+prefix = item
+
+[source]
+blueprint = transmogrifier.from
+expression = python:[{'id': '${transmogrifier:prefix}'}]
+
+[set]
+blueprint = transmogrifier.set
+title = python:item['id']
+""")
+        self.items = []
+
+        class Collector(object):
+            def __init__(self, transmogrifier, name, options, previous):
+                options['collected'] = 'true'
+                self.previous = previous
+
+            def __iter__(self):
+                for item in self.previous:
+                    collected.append(item)
+                    yield item
+
+        collected = self.items
+        classImplements(Collector, ISection)
+        provideUtility(Collector, ISectionBlueprint,
+                       name='transmogrifier.tests.collector')
+
+    def testPrepare(self):
+        plan = Transmogrifier({}).prepare('transmogrifier.tests.plan')
+        self.assertEqual(plan.sections, ['source', 'set'])
+        self.assertEqual(
+            plan.substitutions.get_section('source')['expression'],
+            "python:[{'id': 'item'}]")
+        self.assertEqual(sorted(plan.blueprints),
+                         ['transmogrifier.from', 'transmogrifier.set'])
+
+    def testExecute(self):
+        plan = Transmogrifier({}).prepare(
+            'transmogrifier.tests.plan',
+            set={'blueprint': 'transmogrifier.tests.collector'})
+        plan('first')
+        plan('second', transmogrifier={'prefix': 'other'})
+        plan('third')
+        self.assertEqual([item['id'] for item in self.items],
+                         ['item', 'other', 'item'])
+        # Options modified by the blueprints do not leak into the plan
+        self.assertNotIn('collected', plan.config['set'])
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def testPrefetch(self):
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.instrumentprefetch', """\
+[transmogrifier]
+instrument = true
+pipeline =
+    source
+    set
+    prefetch
+    set2
+
+[source]
+blueprint = transmogrifier.from
+expression = python:({'id': i} for i in range(10000))
+
+[set]
+blueprint = transmogrifier.set
+title = python:item['id']
+
+[prefetch]
+blueprint = transmogrifier.prefetch
+depth = 10
+
+[set2]
+blueprint = transmogrifier.set
+title = python:item['title']
+""")
+        # Switch threads often to interleave the sections of both threads
+        if hasattr(sys, 'setswitchinterval'):
+            interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+        else:  # Python 2
+            interval = None
+        try:
+            transmogrifier = Transmogrifier({})
+            transmogrifier('transmogrifier.tests.instrumentprefetch')
+        finally:
+            if interval is not None:
+                sys.setswitchinterval(interval)
+        summary = dict((section['name'], section)
+                       for section in transmogrifier.recorder.summary())
+        for name in ['source', 'set', 'prefetch', 'set2']:
+            self.assertEqual(summary[name]['items_out'], 10000)
+            self.assertGreaterEqual(summary[name]['time'], 0.)
+        for name in ['set', 'prefetch', 'set2']:
+            self.assertEqual(summary[name]['items_in'], 10000)
+
+    def testThreaded(self):
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.instrumentthreaded', """\
+[transmogrifier]
+instrument = true
+pipeline =
+    source
+    threaded
+
+[source]
+blueprint = transmogrifier.from
+expression = python:({'id': i} for i in range(200))
+
+[threaded]
+blueprint = transmogrifier.threaded
+pipeline =
+    set
+
+[set]
+blueprint = transmogrifier.set
+title = python:item['id']
+""")
+        transmogrifier = Transmogrifier({})
+        transmogrifier('transmogrifier.tests.instrumentthreaded')
+        summary = transmogrifier.recorder.summary()
+        self.assertEqual([section['name'] for section in summary],
+                         ['source', 'threaded', 'set'])
+        for section in summary:
+            self.assertEqual(section['items_out'], 200)
+            self.assertGreaterEqual(section['time'], 0.)
+
+
+class ExpressionTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _makeExpression(self, expression, **extras):
+        from transmogrifier.expression import Expression
+        return Expression(expression, Transmogrifier({}), 'section', {},
+                          **extras)
+
+    def testEvaluate(self):
+        expression = self._makeExpression("python:item['id'] + 1")
+        self.assertEqual(expression({'id': 1}), 2)
+        self.assertEqual(expression({'id': 2}), 3)
+
+    def testExtras(self):
+        expression = self._makeExpression('string:${name}-${foo}-${bar}',
+                                          foo='spam')
+        self.assertEqual(expression(None, bar='eggs'), 'section-spam-eggs')
+
+    def testCompiledOnce(self):
+        a = self._makeExpression("item['id']")
+        b = self._makeExpression("python:item['id']")
+        c = self._makeExpression("python:item['id']", foo='bar')
+        self.assertIs(a.evaluate, b.evaluate)
+        self.assertIsNot(a.evaluate, c.evaluate)
+
+    def testBatch(self):
+        expression = self._makeExpression("python:item['id'] + foo")
+        items = [{'id': 1, 'foo': 1}, {'id': 2, 'foo': 2}]
+        self.assertEqual(expression.batch(items, items), [2, 4])
+        self.assertEqual(items, [{'id': 1, 'foo': 1}, {'id': 2, 'foo': 2}])
+
+    def testMemoize(self):
+        from transmogrifier.expression import MemoizedExpression
+        expression = MemoizedExpression(
+            self._makeExpression("python:item['id'] * 2"), ['type'], 2)
+        self.assertEqual(expression({'id': 1, 'type': 'a'}), 2)
+        self.assertEqual(expression({'id': 2, 'type': 'a'}), 2)
+        self.assertEqual(expression({'id': 3, 'type': 'b'}), 6)
+        self.assertEqual(expression({'id': 4, 'type': 'c'}), 8)
+        self.assertEqual(expression({'id': 5, 'type': 'a'}), 10)
+        self.assertEqual(expression({'id': 6, 'type': ['x']}), 12)
+        self.assertEqual(expression.cache_info(),
+                         dict(hits=1, misses=4, size=2, maxsize=2))
+
+    def testMemoizeOption(self):
+        from transmogrifier.blueprints.expression import ExpressionSetter
+        items = [{'id': i, 'type': i % 2} for i in range(4)]
+        options = {'blueprint': 'transmogrifier.set',
+                   'memoize': 'title: type',
+                   'title': "python:item['type']"}
+        handler = InstalledHandler('transmogrifier', level=logging.INFO)
+        try:
+            section = ExpressionSetter(
+                Transmogrifier({}), 'setter', options, iter(items))
+            self.assertEqual(len(list(section)), 4)
+            self.assertEqual(section.memoized['title'].cache_info(),
+                             dict(hits=2, misses=2, size=2, maxsize=1000))
+            self.assertEqual(
+                [record.getMessage() for record in handler.records],
+                ['ExpressionSetter:setter memoized title: 2 hits, 2 misses, '
+                 '2/1000 cached'])
+        finally:
+            handler.uninstall()
+
+        for memoize in ('title type', 'other: type', 'condition: type'):
+            options['memoize'] = memoize
+            section = ExpressionSetter(
+                Transmogrifier({}), 'setter', options, iter(items))
+            self.assertRaises(ValueError, list, section)
+
+    def testBatchSizeOption(self):
+        from transmogrifier.blueprints.expression import ExpressionBatchSetter
+        for batch_size in ('0', '-1'):
+            options = {'blueprint': 'transmogrifier.set.batch',
+                       'batch_size': batch_size,
+                       'title': "python:item['id']"}
+            section = ExpressionBatchSetter(
+                Transmogrifier({}), 'setter', options, iter([{'id': 1}]))
+            self.assertRaises(ValueError, list, section)
+
+    def testNativeEngine(self):
+        from transmogrifier.expression import Expression
+        transmogrifier = Transmogrifier({})
+        transmogrifier._data = {
+            'transmogrifier': {'expression_engine': 'native'}}
+        expression = Expression("python:[item[k] for k in ('a', 'b')]",
+                                transmogrifier, 'section', {})
+        self.assertIsNotNone(expression.code)
+        self.assertEqual(expression({'a': 1, 'b': 2}), [1, 2])
+        expression = Expression('string:${name}', transmogrifier,
+                                'section', {})
+        self.assertIsNone(expression.code)
+        self.assertEqual(expression(None), 'section')
+
+
+class ConditionTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _getCondition(self, expression):
+        from transmogrifier.condition import get_condition
+        return get_condition(expression, Transmogrifier({}), 'section', {})
+
+    def testConstantFolding(self):
+        from transmogrifier.condition import ALWAYS
+        from transmogrifier.condition import NEVER
+        self.assertIs(self._getCondition(None), ALWAYS)
+        self.assertIs(self._getCondition(''), ALWAYS)
+        self.assertIs(self._getCondition('python:True'), ALWAYS)
+        self.assertIs(self._getCondition('string:yes'), ALWAYS)
+        self.assertIs(self._getCondition('python: 0'), NEVER)
+        self.assertIs(self._getCondition('False'), NEVER)
+
+    def testDynamic(self):
+        from transmogrifier.condition import Condition
+        condition = self._getCondition("python:item.get('id')")
+        self.assertIsInstance(condition, Condition)
+        self.assertTrue(condition({'id': 1}))
+        self.assertFalse(condition({}))
+
+
+class CheckpointTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _makeCheckpoint(self):
+        from transmogrifier.checkpoint import Checkpoint
+        return Checkpoint(os.path.join(self.layer.tempdir, 'state.json'))
+
+    def testFilteredItems(self):
+        checkpoint = self._makeCheckpoint()
+        items = [{'id': i} for i in range(3)]
+        for position, item in enumerate(items, 1):
+            checkpoint.register('source', item, position)
+        checkpoint.processed(items[0])
+        self.assertEqual(checkpoint.positions, {'source': 1})
+        # Items registered before the processed one were filtered out
+        checkpoint.processed(items[2])
+        self.assertEqual(checkpoint.positions, {'source': 3})
+        self.assertFalse(checkpoint._pending)
+        self.assertFalse(checkpoint._seqs)
+        # Items are not changed
+        self.assertEqual(items, [{'id': i} for i in range(3)])
+
+    def testReplacedItems(self):
+        checkpoint = self._makeCheckpoint()
+        first, second = {'id': 1}, {'id': 2}
+        checkpoint.register('source', first, 1)
+        checkpoint.register('source', second, 2)
+        checkpoint.register('other', 'not a mapping', 1)
+        # Copies of registered items do not advance any position
+        checkpoint.processed(dict(first))
+        self.assertEqual(checkpoint.positions, {})
+        checkpoint.processed(second)
+        self.assertEqual(checkpoint.positions, {'source': 2})
+        self.assertEqual(checkpoint.count, 2)
+
+    def testResumeSinks(self):
+        from transmogrifier.spool import SpoolReader
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.checkpointsinks', """\
+[transmogrifier]
+checkpoint = {0:s}
+checkpoint_interval = 1
+pipeline =
+    source
+    check
+    csv
+    jsonl
+    spool
+
+[source]
+blueprint = transmogrifier.from
+expression = python:[{{'id': i}} for i in range(5)]
+
+[check]
+blueprint = transmogrifier.transform
+fail = item['id'] != 3 or 1 / 0
+
+[csv]
+blueprint = transmogrifier.to_csv
+filename = output.csv
+
+[jsonl]
+blueprint = transmogrifier.to_jsonl
+filename = output.jsonl
+
+[spool]
+blueprint = transmogrifier.to_spool
+filename = output.spool
+block_size = 2
+""".format(os.path.join(self.layer.tempdir, 'state.json')))
+
+        def get_overrides(name):
+            return dict(
+                csv={'filename': os.path.join(self.layer.tempdir,
+                                              name + '.csv')},
+                jsonl={'filename': os.path.join(self.layer.tempdir,
+                                                name + '.jsonl')},
+                spool={'filename': os.path.join(self.layer.tempdir,
+                                                name + '.spool')})
+
+        def read(name):
+            path = os.path.join(self.layer.tempdir, name)
+            if name.endswith('.spool'):
+                reader = SpoolReader(path)
+                try:
+                    return list(reader)
+                finally:
+                    reader.close()
+            with open(path, 'rb') as fp:
+                return fp.read()
+
+        self.assertRaises(ZeroDivisionError, Transmogrifier({}),
+                          'transmogrifier.tests.checkpointsinks',
+                          **get_overrides('resumed'))
+        self.assertEqual(read('resumed.csv'), b'id\r\n0\r\n1\r\n2\r\n')
+        transmogrifier = Transmogrifier({})
+        transmogrifier.resume = True
+        transmogrifier('transmogrifier.tests.checkpointsinks',
+                       check={'fail': 'True'}, **get_overrides('resumed'))
+
+        transmogrifier = Transmogrifier({})
+        transmogrifier('transmogrifier.tests.checkpointsinks',
+                       check={'fail': 'True'}, **get_overrides('expected'))
+
+        for extension in ['.csv', '.jsonl', '.spool']:
+            self.assertEqual(read('resumed' + extension),
+                             read('expected' + extension))
+        self.assertEqual(len(read('expected.spool')), 5)
+
+    def testUnordered(self):
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.checkpointunordered', """\
+[transmogrifier]
+checkpoint = {0:s}
+pipeline =
+    source
+    threaded
+
+[source]
+blueprint = transmogrifier.from
+expression = python:[{{'id': i}} for i in range(4)]
+
+[threaded]
+blueprint = transmogrifier.threaded
+ordered = false
+pipeline =
+    set
+
+[set]
+blueprint = transmogrifier.set
+title = python:item['id']
+""".format(os.path.join(self.layer.tempdir, 'state.json')))
+        self.assertRaises(ValueError, Transmogrifier({}),
+                          'transmogrifier.tests.checkpointunordered')
+
+
+class ParallelTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def testUnpicklableResult(self):
+        import signal
+        from multiprocessing.pool import MaybeEncodingError
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.parallelunpicklable', """\
+[transmogrifier]
+pipeline =
+    source
+    parallel
+
+[source]
+blueprint = transmogrifier.from
+expression = [{'id': i} for i in range(4)]
+
+[parallel]
+blueprint = transmogrifier.parallel
+workers = 2
+chunk_size = 1
+ordered = false
+pipeline =
+    set
+
+[set]
+blueprint = transmogrifier.set
+function = (lambda: None)
+""")
+
+        def timeout(signum, frame):
+            raise AssertionError('Failed result was never yielded')
+
+        handler = signal.signal(signal.SIGALRM, timeout)
+        signal.alarm(30)
+        try:
+            self.assertRaises(MaybeEncodingError, Transmogrifier({}),
+                              'transmogrifier.tests.parallelunpicklable')
+        finally:
+            signal.alarm(0)
+            signal.signal(signal.SIGALRM, handler)
+
+
+class ThreadedTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def testUnorderedError(self):
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.threadederror', """\
+[transmogrifier]
+pipeline =
+    source
+    threaded
+
+[source]
+blueprint = transmogrifier.from
+expression = [{'id': i} for i in range(4)]
+
+[threaded]
+blueprint = transmogrifier.threaded
+ordered = false
+pipeline =
+    set
+
+[set]
+blueprint = transmogrifier.set
+title = python:1 // (item['id'] - 2)
+""")
+        self.assertRaises(ZeroDivisionError, Transmogrifier({}),
+                          'transmogrifier.tests.threadederror')
+
+
+class CSVSourceTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _makeSource(self, data, checkpoint=None, **options):
+        from transmogrifier.blueprints.data import CSVSource
+        filename = os.path.join(self.layer.tempdir, 'input.csv')
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+        options['filename'] = filename
+        transmogrifier = Transmogrifier({})
+        transmogrifier.checkpoint = checkpoint
+        return CSVSource(transmogrifier, 'source', options, iter(()))
+
+    def testEncoding(self):
+        source = self._makeSource(b'id,title\n1,\xe9\n', encoding='latin-1')
+        self.assertEqual(list(source), [{'id': '1', 'title': '\xe9'}])
+
+    def testFieldnames(self):
+        source = self._makeSource(b'1\t2\n', fieldnames='a b',
+                                  delimiter='\\t')
+        self.assertEqual(list(source), [{'a': '1', 'b': '2'}])
+
+    def testResume(self):
+        from transmogrifier.checkpoint import Checkpoint
+        path = os.path.join(self.layer.tempdir, 'state.json')
+        data = b'id,title\n1,"a\nb"\n2,c\n3,d\n'
+
+        checkpoint = Checkpoint(path)
+        source = self._makeSource(data, checkpoint)
+        for item in list(source)[:2]:
+            checkpoint.processed(item)
+        checkpoint.close(False)
+
+        checkpoint = Checkpoint(path, resume=True)
+        self.assertEqual(checkpoint.position('source'), [2, 21])
+        source = self._makeSource(data, checkpoint)
+        self.assertEqual(list(source), [{'id': '3', 'title': 'd'}])
+
+    def testParallel(self):
+        data = b'id,title\n' + b''.join(
+            b'%d,"a\n""b"",\nc %d"\r\n' % (i, i) for i in range(100))
+        expected = list(self._makeSource(data))
+        self.assertEqual(len(expected), 100)
+        source = self._makeSource(data, workers='3', range_size='50')
+        self.assertEqual(list(source), expected)
+
+    def testRanges(self):
+        from transmogrifier.blueprints.data import get_ranges
+        filename = os.path.join(self.layer.tempdir, 'input.csv')
+        with open(filename, 'wb') as fp:
+            fp.write(b'a,"b\nc"\nd,e\nf,g\n')
+        self.assertEqual(get_ranges(filename, 0, 16, 2),
+                         [(0, 8), (8, 12), (12, 16)])
+        self.assertEqual(get_ranges(filename, 0, 16, 100), [(0, 16)])
+
+    def testCompression(self):
+        import gzip
+        filename = os.path.join(self.layer.tempdir, 'input.csv.gz')
+        with gzip.open(filename, 'wb') as fp:
+            fp.write(b'id,title\n1,a\n')
+        with gzip.open(filename, 'ab') as fp:
+            fp.write(b'2,b\n')
+        from transmogrifier.blueprints.data import CSVSource
+        source = CSVSource(Transmogrifier({}), 'source',
+                           {'filename': filename}, iter(()))
+        self.assertEqual(list(source), [{'id': '1', 'title': 'a'},
+                                        {'id': '2', 'title': 'b'}])
+
+
+class JSONLinesTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def testRoundtrip(self):
+        from transmogrifier.blueprints.jsonl import JSONLinesConstructor
+        from transmogrifier.blueprints.jsonl import JSONLinesSource
+        filename = os.path.join(self.layer.tempdir, 'items.jsonl')
+        items = [{'id': i, 'title': '\xe9', 'nested': {'a': [i]}}
+                 for i in range(5)]
+        constructor = JSONLinesConstructor(
+            Transmogrifier({}), 'constructor',
+            {'filename': filename, 'batch_size': '2'}, iter(items))
+        self.assertEqual(list(constructor), items)
+        with open(filename, 'rb') as fp:
+            self.assertEqual(len(fp.readlines()), 5)
+        source = JSONLinesSource(Transmogrifier({}), 'source',
+                                 {'filename': filename}, iter(()))
+        self.assertEqual(list(source), items)
+
+    def testResume(self):
+        from transmogrifier.blueprints.jsonl import JSONLinesSource
+        from transmogrifier.checkpoint import Checkpoint
+        filename = os.path.join(self.layer.tempdir, 'items.jsonl')
+        with open(filename, 'wb') as fp:
+            fp.write(b'{"id": 1}\n\n{"id": 2}\n{"id": 3}\n')
+        path = os.path.join(self.layer.tempdir, 'state.json')
+
+        transmogrifier = Transmogrifier({})
+        transmogrifier.checkpoint = Checkpoint(path)
+        source = JSONLinesSource(transmogrifier, 'source',
+                                 {'filename': filename}, iter(()))
+        for item in list(source)[:2]:
+            transmogrifier.checkpoint.processed(item)
+        transmogrifier.checkpoint.close(False)
+
+        transmogrifier.checkpoint = Checkpoint(path, resume=True)
+        source = JSONLinesSource(transmogrifier, 'source',
+                                 {'filename': filename}, iter(()))
+        self.assertEqual(list(source), [{'id': 3}])
+
+
+class JSONStreamTests(unittest.TestCase):
+
+    document = {
+        'meta': {'x': [1, {'y': '"]}'}], 's': 'a\\"b]'},
+        'items': [{'id': i, 'n': 1.5e3 * i, 't': '\xe9"\n'}
+                  for i in range(10)],
+        'tail': 12345,
+    }
+
+    def _select(self, path, block_size=1):
+        import json
+        from transmogrifier.jsonstream import iter_path
+        data = json.dumps(self.document, indent=1).encode('utf-8')
+        return list(iter_path(io.BytesIO(data), path, block_size=block_size))
+
+    def testParsePath(self):
+        from transmogrifier.jsonstream import WILDCARD
+        from transmogrifier.jsonstream import parse_path
+        self.assertEqual(parse_path('$.items[*]'), ['items', WILDCARD])
+        self.assertEqual(parse_path("$['a b'][2].*"), ['a b', 2, WILDCARD])
+        self.assertEqual(parse_path('$'), [])
+        self.assertRaises(ValueError, parse_path, '$items')
+
+    def testSelect(self):
+        for block_size in [1, 7, 1024]:
+            self.assertEqual(self._select('$.items[*]', block_size),
+                             self.document['items'])
+            self.assertEqual(self._select('$.tail', block_size), [12345])
+            self.assertEqual(self._select('$.meta.x[1].y', block_size),
+                             ['"]}'])
+            self.assertEqual(self._select('$', block_size), [self.document])
+        self.assertEqual(self._select('$.missing[*]'), [])
+
+    def testNumbers(self):
+        from transmogrifier.jsonstream import iter_path
+        numbers = [12.5, -0.25e3, 1E-7, 123456789, 0, 12.5e+3, -7]
+        data = b'{"a": [12.5, -0.25e3, 1E-7, 123456789, 0, 12.5e+3, -7],' \
+               b' "b": 12.5e3, "c": -1.5E-2}'
+        for block_size in range(1, 9):
+            self.assertEqual(list(iter_path(io.BytesIO(data), '$.a[*]',
+                                            block_size=block_size)), numbers)
+            self.assertEqual(list(iter_path(io.BytesIO(data), '$.c',
+                                            block_size=block_size)), [-1.5e-2])
+            self.assertEqual(list(iter_path(io.BytesIO(b'12.5e3'), '$',
+                                            block_size=block_size)), [12.5e3])
+
+    def testInvalid(self):
+        from transmogrifier.jsonstream import iter_path
+        for data in [b'[1, 2', b'[1 2]', b'[1] x', b'[1,]']:
+            self.assertRaises(ValueError, list, iter_path(io.BytesIO(data)))
+
+    def testMalformedValue(self):
+        from transmogrifier.jsonstream import iter_path
+        for value in [b'tru', b'"\\x"', b'{"a" 1}', b'{"a": 1 "b": 2}']:
+            fp = io.BytesIO(b'[' + value + b', "' + b'x' * 10000 + b'"]')
+            self.assertRaises(ValueError, list,
+                              iter_path(fp, block_size=16))
+            self.assertLess(fp.tell(), 100)
+        fp = io.BytesIO(b'[{"a": "\\u00e9 ' + b'x' * 100 + b'", "b": true}]')
+        self.assertEqual(list(iter_path(fp, block_size=4)),
+                         [{'a': '\xe9 ' + 'x' * 100, 'b': True}])
+
+
+class XMLSourceTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _makeSource(self, data, **options):
+        from transmogrifier.blueprints.xmlsource import XMLSource
+        filename = os.path.join(self.layer.tempdir, 'input.xml')
+        with open(filename, 'wb') as fp:
+            fp.write(data)
+        options['filename'] = filename
+        return XMLSource(Transmogrifier({}), 'source', options, iter(()))
+
+    def testPath(self):
+        data = b'<a><b><c>1</c></b><c>2</c><b><c>3</c></b></a>'
+        self.assertEqual([item['_text'] for item in
+                          self._makeSource(data, path='c')], ['1', '2', '3'])
+        self.assertEqual([item['_text'] for item in
+                          self._makeSource(data, path='b/c')], ['1', '3'])
+        self.assertEqual([item['_text'] for item in
+                          self._makeSource(data, path='/a/c')], ['2'])
+        self.assertEqual([item['_tag'] for item in
+                          self._makeSource(data)], ['b', 'c', 'b'])
+
+    def testNested(self):
+        data = (b'<a><item><title>outer</title>'
+                b'<item><title>inner</title></item></item></a>')
+        items = list(self._makeSource(data, path='//item'))
+        self.assertEqual(items, [
+            {'_tag': 'item', 'title': 'inner'},
+            {'_tag': 'item', 'title': 'outer', 'item': 'inner'}])
+
+    def testClearing(self):
+        from transmogrifier.blueprints.xmlsource import ElementTree
+        parse = ElementTree.iterparse
+        roots = []
+
+        def iterparse(*args, **kwargs):
+            for event, element in parse(*args, **kwargs):
+                if not roots:
+                    roots.append(element)
+                yield event, element
+
+        # The parser reads ahead, but completed elements must not pile up
+        data = b'<a><h/>' + b'<b><c>1</c></b>' * 10000 + b'</a>'
+        source = self._makeSource(data)
+        ElementTree.iterparse = iterparse
+        try:
+            for item in source:
+                self.assertLess(len(roots[0]), 5000)
+        finally:
+            ElementTree.iterparse = parse
+        self.assertEqual(len(roots[0]), 0)
+
+
+class SpoolTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _write(self, count, **kwargs):
+        from transmogrifier.spool import SpoolWriter
+        filename = os.path.join(self.layer.tempdir, 'items.spool')
+        writer = SpoolWriter(open(filename, 'wb'), **kwargs)
+        for i in range(count):
+            writer.write({'id': i})
+        return filename, writer
+
+    def testSlice(self):
+        from transmogrifier.spool import SpoolReader
+        filename, writer = self._write(10, block_size=3)
+        writer.close()
+        for use_mmap in [True, False]:
+            reader = SpoolReader(filename, use_mmap)
+            self.assertEqual(len(reader), 10)
+            self.assertEqual(len(reader.index), 4)
+            self.assertEqual([item['id'] for item in reader], list(range(10)))
+            self.assertEqual([number for number, item in
+                              reader.iter_slice(4, 8)], [4, 5, 6, 7])
+            self.assertEqual(list(reader.iter_slice(10)), [])
+            reader.close()
+
+    def testIncomplete(self):
+        from transmogrifier.spool import SpoolReader
+        filename, writer = self._write(10, block_size=4, compression='bz2')
+        writer.fp.close()  # interrupted before the last block and the index
+        reader = SpoolReader(filename)
+        self.assertEqual(len(reader), 8)
+        self.assertEqual([item['id'] for number, item in
+                          reader.iter_slice(6)], [6, 7])
+        reader.close()
+
+    def testChangedAfterSpool(self):
+        from transmogrifier.blueprints.spool import SpoolConstructor
+        from transmogrifier.spool import SpoolReader
+        filename = os.path.join(self.layer.tempdir, 'items.spool')
+        items = [{'id': i, 'text': 'x', 'tags': ['a']} for i in range(5)]
+        constructor = SpoolConstructor(
+            Transmogrifier({}), 'constructor', {'filename': filename},
+            iter(items))
+        for item in constructor:
+            del item['text']
+            item['tags'].append('b')
+        reader = SpoolReader(filename)
+        self.assertEqual(list(reader), [{'id': i, 'text': 'x', 'tags': ['a']}
+                                        for i in range(5)])
+        reader.close()
+
+    def testValues(self):
+        from collections import OrderedDict
+        from transmogrifier.spool import SpoolReader
+        from transmogrifier.spool import SpoolWriter
+        import datetime
+        item = {
+            'none': None, 'bool': [True, False], 'int': [0, -7, 2 ** 70],
+            'float': 1.5, 'complex': 1 - 2j, 'text': '\xe9', 'bytes': b'\xe9',
+            'tuple': (1, ('a',)), 'set': set([1]), 'frozenset': frozenset(),
+            'dict': {1: {}, (2, 3): OrderedDict([('b', 1), ('a', 2)])},
+            'date': datetime.date(2015, 1, 2),
+            'time': datetime.time(1, 2, 3, 4),
+            'datetime': datetime.datetime(2015, 1, 2, 3, 4, 5, 6),
+            'timedelta': datetime.timedelta(-1, 2, 3),
+        }
+        filename = os.path.join(self.layer.tempdir, 'items.spool')
+        writer = SpoolWriter(open(filename, 'wb'))
+        writer.write(item)
+        writer.close()
+        reader = SpoolReader(filename)
+        [result] = list(reader)
+        reader.close()
+        self.assertEqual(result, item)
+        self.assertIsInstance(result['dict'][(2, 3)], OrderedDict)
+        self.assertEqual(list(result['dict'][(2, 3)]), ['b', 'a'])
+
+        writer = SpoolWriter(open(filename, 'wb'))
+        for value in [object(), Exception('x'), {'a': [lambda: None]}]:
+            self.assertRaises(TypeError, writer.write, {'value': value})
+        writer.close()
+
+    def testCorrupted(self):
+        from transmogrifier.spool import LENGTH
+        from transmogrifier.spool import decode_records
+        from transmogrifier.spool import encode_record
+        data = encode_record({'id': 1}) + encode_record({'id': 2})
+        self.assertEqual(decode_records(data), [{'id': 1}, {'id': 2}])
+        self.assertEqual(decode_records(data, 1), [{'id': 2}])
+        invalid = [b'{"id":}', b'{"\\u0000":"?","v":1}',
+                   b'{"\\u0000":"e","v":[[1]]}', b'{"\\u0000":"D"}']
+        for data_ in [data[:-1], b'\x00' + data] + [
+                LENGTH.pack(len(record)) + record for record in invalid]:
+            self.assertRaises(ValueError, decode_records, data_)
+
+    def testShard(self):
+        from transmogrifier.spool import get_shard
+        self.assertEqual([get_shard('{0:d}/3'.format(i), 10)
+                          for i in range(3)], [(0, 3), (3, 6), (6, 10)])
+        self.assertRaises(ValueError, get_shard, '3/3', 10)
+
+    def testNotSpool(self):
+        from transmogrifier.spool import SpoolReader
+        filename = os.path.join(self.layer.tempdir, 'items.spool')
+        with open(filename, 'wb') as fp:
+            fp.write(b'id,title\n')
+        self.assertRaises(ValueError, SpoolReader, filename)
+
+
+class SQLiteTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _construct(self, items, **options):
+        from transmogrifier.blueprints.sqlite import SQLiteConstructor
+        options.setdefault('database',
+                           os.path.join(self.layer.tempdir, 'items.db'))
+        options.setdefault('table', 'items')
+        return SQLiteConstructor(Transmogrifier({}), 'constructor', options,
+                                 iter(items))
+
+    def _select(self):
+        import sqlite3
+        connection = sqlite3.connect(
+            os.path.join(self.layer.tempdir, 'items.db'))
+        try:
+            return connection.execute(
+                'SELECT * FROM items ORDER BY id').fetchall()
+        finally:
+            connection.close()
+
+    def testTransactions(self):
+        def items():
+            for i in range(5):
+                yield {'id': i}
+            raise RuntimeError('failure')
+        constructor = self._construct(items(), batch_size='1',
+                                      transaction_size='2')
+        self.assertRaises(RuntimeError, list, constructor)
+        self.assertEqual(self._select(), [(0,), (1,), (2,), (3,)])
+
+    def testResume(self):
+        import sqlite3
+        database = os.path.join(self.layer.tempdir, 'resume.db')
+        self.layer.registerConfiguration(
+            'transmogrifier.tests.sqliteresume', """\
+[transmogrifier]
+checkpoint = {0:s}
+checkpoint_interval = 2
+pipeline =
+    source
+    constructor
+    check
+
+[source]
+blueprint = transmogrifier.from
+expression = python:[{{'id': i}} for i in range(5)]
+
+[constructor]
+blueprint = transmogrifier.to_sqlite
+database = {1:s}
+table = items
+batch_size = 1
+
+[check]
+blueprint = transmogrifier.transform
+fail = item['id'] != 3 or 1 / 0
+""".format(os.path.join(self.layer.tempdir, 'state.json'), database))
+        self.assertRaises(ZeroDivisionError, Transmogrifier({}),
+                          'transmogrifier.tests.sqliteresume')
+        transmogrifier = Transmogrifier({})
+        transmogrifier.resume = True
+        transmogrifier('transmogrifier.tests.sqliteresume',
+                       check={'fail': 'True'})
+        connection = sqlite3.connect(database)
+        try:
+            self.assertEqual(connection.execute(
+                'SELECT id FROM items ORDER BY id').fetchall(),
+                [(0,), (1,), (2,), (3,), (4,)])
+        finally:
+            connection.close()
+
+    def testRollback(self):
+        import sqlite3
+        from transmogrifier.blueprints.sqlite import rollback
+        handler = InstalledHandler('transmogrifier')
+        try:
+            connection = sqlite3.connect(':memory:')
+            connection.close()
+            rollback(connection)  # does not raise
+
+            constructor = iter(self._construct([{'id': 1}, {'id': 2}]))
+            next(constructor)
+            constructor.close()
+            messages = [record.getMessage() for record in handler.records]
+            self.assertTrue(messages[0].startswith('Rollback failed: '))
+            self.assertEqual(messages[1:], [
+                'SQLiteConstructor:constructor closed before the end of '
+                'the pipeline, discarding 1 uncommitted rows'])
+        finally:
+            handler.uninstall()
+        self.assertEqual(self._select(), [])
+
+    def testModes(self):
+        list(self._construct([{'id': 1, 'a': 'x'}], key='id'))
+        self.assertRaises(Exception, list,
+                          self._construct([{'id': 1, 'a': 'y'}]))
+        list(self._construct([{'id': 1, 'a': 'y'}], mode='ignore'))
+        self.assertEqual(self._select(), [(1, 'x')])
+        list(self._construct([{'id': 1, 'a': 'y'}], mode='upsert', key='id'))
+        self.assertEqual(self._select(), [(1, 'y')])
+        self.assertRaises(ValueError, list,
+                          self._construct([{'id': 1}], mode='upsert'))
+
+    def testQuote(self):
+        from transmogrifier.blueprints.sqlite import get_insert_statement
+        self.assertEqual(
+            get_insert_statement('a"b', ['id', 'c'], 'upsert', ['id']),
+            'INSERT INTO "a""b" ("id", "c") VALUES (?, ?) '
+            'ON CONFLICT ("id") DO UPDATE SET "c" = excluded."c"')
+
+
+class DirectorySourceTests(unittest.TestCase):
+
+    layer = TransmogrifierLayer
+
+    def _makeSource(self, **options):
+        from transmogrifier.blueprints.directory import DirectorySource
+        for path in ['a.txt', 'b/c.txt', 'b/d/e.txt']:
+            path = os.path.join(self.layer.tempdir, *path.split('/'))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as fp:
+                fp.write(b'a')
+        options['path'] = self.layer.tempdir
+        return DirectorySource(Transmogrifier({}), 'source', options,
+                               iter(()))
+
+    def testWalk(self):
+        self.assertEqual([item['_path'] for item in self._makeSource()],
+                         ['a.txt', 'b/c.txt', 'b/d/e.txt'])
+        self.assertEqual([item['_path'] for item in self._makeSource(
+                          directories='true', exclude='re:b/d$')],
+                         ['a.txt', 'b', 'b/c.txt'])
+        self.assertEqual([item['_path'] for item in self._makeSource(
+                          recursive='false', include='glob:*.txt')],
+                         ['a.txt'])
+
+    def testUnlistable(self):
+        import shutil
+        source = iter(self._makeSource())
+        handler = InstalledHandler('transmogrifier', level=logging.WARNING)
+        try:
+            self.assertEqual(next(source)['_path'], 'a.txt')
+            shutil.rmtree(os.path.join(self.layer.tempdir, 'b'))
+            self.assertEqual(list(source), [])
+            self.assertEqual(len(handler.records), 1)
+            self.assertIn('DirectorySource:source cannot list',
+                          handler.records[0].getMessage())
+        finally:
+            handler.uninstall()
+
+    def testLazyData(self):
+        items = list(self._makeSource(stat='true'))
+        with open(items[0]['_filename'], 'wb') as fp:
+            fp.write(b'changed')
+        self.assertEqual(items[0]['_size'], 1)
+        self.assertNotIn('_data', dict(items[0]))
+        self.assertIn('_data', items[0])
+        self.assertEqual(items[0].get('_data'), b'changed')
+        self.assertEqual(items[0].get('missing'), None)
+
+
+class CompressionTests(unittest.TestCase):
+
+    def _roundtrip(self, compression, data):
+        from transmogrifier.compression import CompressingWriter
+        from transmogrifier.compression import DecompressingReader
+        fp = io.BytesIO()
+        writer = CompressingWriter(fp, compression, 16, closefd=False)
+        for start in range(0, len(data), 10):
+            writer.write(data[start:start + 10])
+        writer.close()
+        self.assertNotEqual(fp.getvalue(), data)
+        fp.seek(0)
+        reader = io.BufferedReader(DecompressingReader(fp, compression))
+        try:
+            return reader.read()
+        finally:
+            reader.close()
+
+    def testRoundtrip(self):
+        from transmogrifier.compression import lzma
+        data = b''.join(b'row %d\n' % i for i in range(1000))
+        for compression in ['gzip', 'bz2'] + (lzma and ['lzma'] or []):
+            self.assertEqual(self._roundtrip(compression, data), data)
+
+    def testBoundedChunks(self):
+        from transmogrifier.compression import get_compressor
+        from transmogrifier.compression import get_decompressor
+        from transmogrifier.compression import iter_decompressed
+        from transmogrifier.compression import lzma
+        data = b'\0' * 100000 + b''.join(b'row %d\n' % i for i in range(1000))
+        for compression in ['gzip', 'bz2'] + (lzma and ['lzma'] or []):
+            compressor = get_compressor(compression)
+            compressed = compressor.compress(data) + compressor.flush()
+            decompressor = get_decompressor(compression)
+            chunks = list(iter_decompressed(decompressor, compressed, 1000))
+            self.assertEqual(b''.join(chunks), data)
+            if hasattr(decompressor, 'unconsumed_tail') or \
+                    hasattr(decompressor, 'needs_input'):
+                self.assertEqual(max(map(len, chunks)), 1000)
+
+    def testTruncated(self):
+        import zlib
+        from transmogrifier.compression import DecompressingReader
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        data = compressor.compress(b'x' * 1000) + compressor.flush()
+        reader = DecompressingReader(io.BytesIO(data[:-10]), 'gzip')
+        self.assertRaises(EOFError, reader.read)
+        reader.close()
+
+    def testGetCompression(self):
+        from transmogrifier.compression import get_compression
+        self.assertEqual(get_compression('a.csv.gz'), 'gzip')
+        self.assertEqual(get_compression('a.csv.BZ2', 'auto'), 'bz2')
+        self.assertEqual(get_compression('a.csv', 'xz'), 'lzma')
+        self.assertEqual(get_compression('a.csv.gz', 'none'), None)
+        self.assertEqual(get_compression('-'), None)
+        self.assertRaises(ValueError, get_compression, 'a.csv', 'zip')
+
+
 class DefaultKeysTest(unittest.TestCase):
 
     layer = TransmogrifierLayer
@@ -258,6 +1561,16 @@ def test_suite():
             '../../../docs/transmogrifier.rst',
             '../../../docs/blueprints/logger.rst',
             '../../../docs/blueprints/pipeline.rst',
+            '../../../docs/blueprints/parallel.rst',
+            '../../../docs/blueprints/threaded.rst',
+            '../../../docs/blueprints/prefetch.rst',
+            '../../../docs/blueprints/csv.rst',
+            '../../../docs/blueprints/json.rst',
+            '../../../docs/blueprints/jsonl.rst',
+            '../../../docs/blueprints/xml.rst',
+            '../../../docs/blueprints/spool.rst',
+            '../../../docs/blueprints/sqlite.rst',
+            '../../../docs/blueprints/directory.rst',
             '../../../docs/blueprints/breakpoint.rst',
             '../../../docs/blueprints/expression.rst',
             '../../../docs/blueprints/filter.rst',
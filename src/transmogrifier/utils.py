@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+from itertools import islice
 from operator import methodcaller
+import fnmatch
 import os.path
 import re
 import pprint
@@ -9,9 +11,11 @@ from six import StringIO
 from zope.component import getUtility
 
 from configparser import RawConfigParser
+from collections import OrderedDict
 from zope.interface.common.mapping import IMapping
 from zope.interface.exceptions import BrokenImplementation
 from zope.interface.verify import verifyObject
+from transmogrifier.instrumentation import instrument
 from transmogrifier.interfaces import ISection
 from transmogrifier.interfaces import ISectionBlueprint
 from transmogrifier.registry import configuration_registry
@@ -51,6 +55,16 @@ def get_lines(value):
                                  (value or '').splitlines())))
 
 
+def get_chunks(iterable, size):
+    """Yield lists of at most size items from iterable"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 def resolvePackageReference(reference):
     """Given a package:filename reference, return the filesystem path
 
@@ -63,25 +77,33 @@ def resolvePackageReference(reference):
     return os.path.join(os.path.dirname(package.__file__), filename)
 
 
-def constructPipeline(transmogrifier, sections, pipeline=None):
+def constructPipeline(transmogrifier, sections, pipeline=None,
+                      blueprints=None):
     """Construct a transmogrifier pipeline
 
     ``sections`` is a list of pipeline section ids. Start the pipeline with
-    ``pipeline``, or if that's None, with an empty iterator.
+    ``pipeline``, or if that's None, with an empty iterator. Optional
+    ``blueprints`` maps blueprint ids to already looked up blueprints.
 
     """
     if pipeline is None:
         pipeline = iter(())  # empty starter section
+    if blueprints is None:
+        blueprints = {}
 
     for section_id in sections:
         section_options = transmogrifier[section_id]
         blueprint_id = section_options['blueprint']
-        blueprint = getUtility(ISectionBlueprint, blueprint_id)
+        blueprint = blueprints.get(blueprint_id)
+        if blueprint is None:
+            blueprint = getUtility(ISectionBlueprint, blueprint_id)
         pipeline = blueprint(transmogrifier, section_id,
                              section_options, pipeline)
         if not ISection.providedBy(pipeline):
             raise ValueError('Blueprint %s for section %s did not return '
                              'an ISection' % (blueprint_id, section_id))
+        pipeline = instrument(transmogrifier, section_id, blueprint_id,
+                              pipeline)
         pipeline = iter(pipeline)  # ensure you can call .next()
 
     return pipeline
@@ -135,7 +157,8 @@ class Matcher(object):
 
     Normally items are matched using equality, unless the expression
     starts with re: or regexp:, in which case it is treated as a regular
-    expression.
+    expression, or with glob:, in which case it is treated as a shell-style
+    wildcard pattern.
 
     Regular expressions will be compiled and applied in match mode
     (matching anywhere in the string).
@@ -155,6 +178,9 @@ class Matcher(object):
             if expr.startswith('re:') or expr.startswith('regexp:'):
                 expr = expr.split(':', 1)[1]
                 expr = re.compile(expr).match
+            elif expr.startswith('glob:'):
+                expr = expr.split(':', 1)[1]
+                expr = re.compile(fnmatch.translate(expr)).match
             else:
                 expr = lambda x, y=expr: x == y  # noqa
             self.expressions.append(expr)
@@ -168,24 +194,47 @@ class Matcher(object):
         return None, False
 
 
-def load_config(configuration_id, seen=None, **overrides):  # flake8: noqa
+def get_configuration_file(configuration_id):
+    """Return path of the file of the given configuration id"""
+    if ':' in configuration_id:
+        return resolvePackageReference(configuration_id)
+    config_info = configuration_registry.getConfiguration(configuration_id)
+    return config_info['configuration']
+
+
+def copy_config(config):
+    return dict((section, dict(options))
+                for section, options in iteritems(config))
+
+
+def resolve_config(configuration_id, seen=None, sources=None, resolved=None):
+    """Return configuration with its includes resolved
+
+    The ids and the files of the configurations read are collected into
+    sources. Configurations included more than once are only read once.
+
+    """
     if seen is None:
         seen = []
+    if sources is None:
+        sources = OrderedDict()
+    if resolved is None:
+        resolved = {}
     if configuration_id in seen:
         raise ValueError(
             'Recursive configuration extends: %s (%r)' % (configuration_id,
                                                           seen))
+    if configuration_id in resolved:
+        return copy_config(resolved[configuration_id])
     seen.append(configuration_id)
 
-    if ':' in configuration_id:
-        configuration_file = resolvePackageReference(configuration_id)
-    else:
-        config_info = configuration_registry.getConfiguration(configuration_id)
-        configuration_file = config_info['configuration']
+    configuration_file = get_configuration_file(configuration_id)
+    sources[configuration_id] = configuration_file
 
     parser = RawConfigParser()
     parser.optionxform = str  # case sensitive
-    parser.readfp(open(configuration_file))
+    with open(configuration_file) as fp:
+        parser.read_file(fp)
 
     result = {}
     includes = None
@@ -195,25 +244,32 @@ def load_config(configuration_id, seen=None, **overrides):  # flake8: noqa
             includes = result[section].pop('include', includes)
 
     if includes:
-        for configuration_id in includes.split()[::-1]:
-            include = load_config(configuration_id, seen)
+        for include_id in includes.split()[::-1]:
+            include = resolve_config(include_id, seen, sources, resolved)
             sections = set(include.keys()) | set(result.keys())
             for section in sections:
                 result[section] = update_section(
                     result.get(section, {}), include.get(section, {}))
 
     seen.pop()
+    resolved[configuration_id] = copy_config(result)
+    return result
+
 
+def apply_overrides(config, overrides):
     for section, options in iteritems(overrides):
-        assert section in result, \
+        assert section in config, \
             'Overrides include non-existing section {0:s}'.format(section)
         for key, value in iteritems(options):
-            assert key in result[section], \
+            assert key in config[section], \
                 'Overrides include non-existing key {0:s}:{1:s}'.format(
                     section, key)
-            result[section][key] = value
+            config[section][key] = value
+    return config
 
-    return result
+
+def load_config(configuration_id, seen=None, **overrides):
+    return apply_overrides(resolve_config(configuration_id, seen), overrides)
 
 
 def update_section(section, included):
@@ -233,9 +289,10 @@ def update_section(section, included):
         option = key.strip(' -')
         if option in keys:
             raise ValueError('Option %s specified twice', option)
+        excluded = set(get_lines(section[key]))
         included[option] = '\n'.join([
             v for v in get_lines(included.get(option))
-            if v not in get_lines(section[key])])
+            if v not in excluded])
         del section[key]
 
     for key in add: